@@ -0,0 +1,118 @@
+"""add composite indexes
+
+Revision ID: 8faac9a19d69
+Revises: 85ccb02d9360
+Create Date: 2026-10-17 12:00:09.369918
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8faac9a19d69"
+down_revision = "85ccb02d9360"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the tables writable while the indexes build; it cannot
+    # run inside a transaction.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_comments_parent_id",
+            "comments",
+            ["parent_id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_comments_wishlist_id_id",
+            "comments",
+            ["wishlist_id", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_historys_comment_id_created_at",
+            "historys",
+            ["comment_id", "created_at"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_stocks_price", table_name="stocks", postgresql_concurrently=True
+        )
+        op.create_index(
+            "ix_wishlist_x_stock_wishlist_id_order_num",
+            "wishlist_x_stock",
+            ["wishlist_id", "order_num"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_wishlists_user_id_created_at",
+            "wishlists",
+            ["user_id", "created_at"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_wishlists_user_id_order_num",
+            "wishlists",
+            ["user_id", "order_num"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_wishlists_user_id_updated_at",
+            "wishlists",
+            ["user_id", "updated_at"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_wishlists_user_id_updated_at",
+            table_name="wishlists",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_wishlists_user_id_order_num",
+            table_name="wishlists",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_wishlists_user_id_created_at",
+            table_name="wishlists",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_wishlist_x_stock_wishlist_id_order_num",
+            table_name="wishlist_x_stock",
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_stocks_price",
+            "stocks",
+            ["price"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_historys_comment_id_created_at",
+            table_name="historys",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_comments_wishlist_id_id",
+            table_name="comments",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_comments_parent_id",
+            table_name="comments",
+            postgresql_concurrently=True,
+        )
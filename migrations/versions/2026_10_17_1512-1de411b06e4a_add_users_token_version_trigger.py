@@ -0,0 +1,45 @@
+"""add users token_version trigger
+
+Revision ID: 1de411b06e4a
+Revises: c7dbbe1ce5f3
+Create Date: 2026-10-17 15:12:35.307899
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "1de411b06e4a"
+down_revision = "c7dbbe1ce5f3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Any change to is_active/is_admin bumps token_version, not just ORM flushes.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION bump_users_token_version() RETURNS trigger AS $$
+        BEGIN
+            NEW.token_version := OLD.token_version + 1;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER users_bump_token_version
+        BEFORE UPDATE OF is_active, is_admin ON users
+        FOR EACH ROW
+        WHEN (
+            OLD.is_active IS DISTINCT FROM NEW.is_active
+            OR OLD.is_admin IS DISTINCT FROM NEW.is_admin
+        )
+        EXECUTE FUNCTION bump_users_token_version()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER users_bump_token_version ON users")
+    op.execute("DROP FUNCTION bump_users_token_version()")
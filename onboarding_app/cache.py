@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Protocol
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    def set(self, key: str, value: Any) -> None:
+        ...
+
+
+class VersionedCache:
+    """Read-through cache for JSON-ready values whose keys embed a version.
+
+    Writers bump the version instead of invalidating entries, so readers that
+    look the current version up first never see older data; superseded entries
+    age out of the LRU. ``shared`` is an optional second tier (e.g. Redis) that
+    lets several processes reuse each other's entries.
+    """
+
+    def __init__(self, local: TTLCache, shared: Optional[CacheBackend] = None):
+        self.local = local
+        self.shared = shared
+
+    def get_or_set(self, key: str, build: Callable[[], Any]) -> Any:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        if self.shared is not None:
+            value = self.shared.get(key)
+        if value is None:
+            value = build()
+            if self.shared is not None:
+                self.shared.set(key, value)
+        self.local.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        self.local.clear()
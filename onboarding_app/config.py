@@ -1,3 +1,6 @@
+import os
+from typing import Literal
+
 from pydantic import BaseSettings, Field, PostgresDsn
 
 
@@ -10,10 +13,65 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_SECONDS: int = Field(
         default=3600, env="ACCESS_TOKEN_EXPIRE_SECONDS"
     )
+    BCRYPT_ROUNDS: int = Field(default=12, env="BCRYPT_ROUNDS")
+    # bcrypt is CPU-bound and releases the GIL, so one worker per core lets
+    # logins use the whole host. On a single core the workers share the CPU with
+    # the event loop: fewer of them leave more for other requests.
+    PASSWORD_HASH_WORKERS: int = Field(
+        default_factory=lambda: max(2, os.cpu_count() or 1),
+        env="PASSWORD_HASH_WORKERS",
+    )
+    PASSWORD_HASH_QUEUE_SIZE: int = Field(default=32, env="PASSWORD_HASH_QUEUE_SIZE")
+    STATELESS_TOKENS: bool = Field(default=False, env="STATELESS_TOKENS")
+    # Bounds how long a privilege change made outside this process (admin SQL,
+    # another worker) takes to reach cached principals and stateless tokens.
+    TOKEN_VERSION_CACHE_TTL_SECONDS: int = Field(
+        default=30, env="TOKEN_VERSION_CACHE_TTL_SECONDS"
+    )
+    PRINCIPAL_CACHE_TTL_SECONDS: int = Field(
+        default=60, env="PRINCIPAL_CACHE_TTL_SECONDS"
+    )
+    PRINCIPAL_CACHE_MAXSIZE: int = Field(default=1024, env="PRINCIPAL_CACHE_MAXSIZE")
+    # Entries are keyed by version, so the TTL only bounds how long superseded
+    # versions linger; it never decides freshness.
+    WISHLIST_CACHE_TTL_SECONDS: int = Field(
+        default=600, env="WISHLIST_CACHE_TTL_SECONDS"
+    )
+    WISHLIST_CACHE_MAXSIZE: int = Field(default=4096, env="WISHLIST_CACHE_MAXSIZE")
     POSTGRES_URL: PostgresDsn = Field(
         default="postgresql://user:password@db:5431/onboarding_app",
         env="POSTGRES_URL",
     )
+    POSTGRES_REPLICA_URLS: list[PostgresDsn] = Field(
+        default=[], env="POSTGRES_REPLICA_URLS"
+    )
+    REPLICA_SELECTION: Literal["round_robin", "least_connections"] = Field(
+        default="round_robin", env="REPLICA_SELECTION"
+    )
+    READ_YOUR_WRITES_SECONDS: float = Field(default=5, env="READ_YOUR_WRITES_SECONDS")
+    # Needs asyncpg, the "async" extra: poetry install --extras async.
+    DB_ASYNC: bool = Field(default=False, env="DB_ASYNC")
+    DB_POOL_SIZE: int = Field(default=5, env="DB_POOL_SIZE")
+    DB_MAX_OVERFLOW: int = Field(default=10, env="DB_MAX_OVERFLOW")
+    DB_POOL_TIMEOUT: float = Field(default=30, env="DB_POOL_TIMEOUT")
+    DB_POOL_PRE_PING: bool = Field(default=False, env="DB_POOL_PRE_PING")
+    DB_POOL_RECYCLE: int = Field(default=-1, env="DB_POOL_RECYCLE")
+    # Dense mode reads stored keys as positions: after switching from sparse, run
+    # scripts/compact_order.py once (see onboarding_app.ordering).
+    ORDER_MODE: Literal["dense", "sparse"] = Field(default="dense", env="ORDER_MODE")
+    DEBUG: bool = Field(default=False, env="DEBUG")
+    N_PLUS_ONE_THRESHOLD: int = Field(default=5, env="N_PLUS_ONE_THRESHOLD")
+    SLOW_QUERY_LOG: bool = Field(default=False, env="SLOW_QUERY_LOG")
+    SLOW_QUERY_THRESHOLD_MS: float = Field(default=200, env="SLOW_QUERY_THRESHOLD_MS")
+    SLOW_QUERY_LOG_PATH: str = Field(
+        default="logs/slow_queries.jsonl", env="SLOW_QUERY_LOG_PATH"
+    )
+    SLOW_QUERY_LOG_MAX_BYTES: int = Field(
+        default=10 * 1024 * 1024, env="SLOW_QUERY_LOG_MAX_BYTES"
+    )
+    SLOW_QUERY_LOG_BACKUP_COUNT: int = Field(
+        default=5, env="SLOW_QUERY_LOG_BACKUP_COUNT"
+    )
 
     class Config:
         env_file = ".env"
@@ -1,20 +1,245 @@
+import itertools
+import math
+import threading
+import time
+from http.cookies import SimpleCookie
+from typing import Any, Callable, Optional, Union
+
+from fastapi import Request
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from onboarding_app.cache import TTLCache
 from onboarding_app.config import settings
+from onboarding_app.pool import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool
 
 SQLALCHEMY_DATABASE_URL = settings.POSTGRES_URL
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+POOL_OPTIONS = dict(
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+)
+READ_ONLY_METHODS = ("GET", "HEAD", "OPTIONS")
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Engines are built on first use so importing the app (workers, tests, alembic)
+# does not open connections. The sessionmakers are bound at the same time.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = sessionmaker(
+    class_=AsyncSession, autocommit=False, autoflush=False, expire_on_commit=False
+)
 
 Base = declarative_base()
 
+_engine: Optional[Engine] = None
+_async_engine: Optional[AsyncEngine] = None
+_replica_router: Optional["ReplicaRouter"] = None
+_engine_lock = threading.Lock()
+
+# Authorization header (or client address) -> True, for clients that wrote
+# recently and must keep reading from the primary. Only this process sees it;
+# the LAST_WRITE_COOKIE carries the same window to other workers and instances.
+recent_writers = TTLCache(maxsize=100_000, ttl=settings.READ_YOUR_WRITES_SECONDS)
+LAST_WRITE_COOKIE = "last_write"
+
+
+class ReplicaRouter:
+    """Picks the replica engine that serves the next read-only session."""
+
+    def __init__(self, engines: list, selection: str = "round_robin"):
+        self.engines = engines
+        self.selection = selection
+        self._cycle = itertools.cycle(engines)
+        self._lock = threading.Lock()
+
+    def choose(self) -> Union[Engine, AsyncEngine]:
+        if self.selection == "least_connections":
+            return min(self.engines, key=_checked_out_connections)
+        with self._lock:
+            return next(self._cycle)
+
+
+def _checked_out_connections(engine: Union[Engine, AsyncEngine]) -> int:
+    return getattr(engine, "sync_engine", engine).pool.checkedout()
+
+
+def _create_engine(url: str) -> Engine:
+    return create_engine(url, poolclass=InstrumentedQueuePool, **POOL_OPTIONS)
+
+
+def _create_async_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url.replace("postgresql://", "postgresql+asyncpg://", 1),
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        **POOL_OPTIONS,
+    )
+
+
+def get_engine() -> Engine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _create_engine(SQLALCHEMY_DATABASE_URL)
+                SessionLocal.configure(bind=_engine)
+    return _engine
 
-def get_db():
-    db = SessionLocal()
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                _async_engine = _create_async_engine(SQLALCHEMY_DATABASE_URL)
+                AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+
+def get_replica_router() -> Optional[ReplicaRouter]:
+    global _replica_router
+    if _replica_router is None and settings.POSTGRES_REPLICA_URLS:
+        with _engine_lock:
+            if _replica_router is None:
+                create = _create_async_engine if settings.DB_ASYNC else _create_engine
+                _replica_router = ReplicaRouter(
+                    [create(url) for url in settings.POSTGRES_REPLICA_URLS],
+                    settings.REPLICA_SELECTION,
+                )
+    return _replica_router
+
+
+def get_created_engines() -> dict[str, Union[Engine, AsyncEngine]]:
+    """Engines opened so far, by name; never creates one."""
+    engines = {"primary": _engine, "async": _async_engine}
+    if _replica_router is not None:
+        engines.update(
+            (f"replica{i}", engine) for i, engine in enumerate(_replica_router.engines)
+        )
+    return {name: engine for name, engine in engines.items() if engine is not None}
+
+
+def _client_key(request: Request) -> str:
+    authorization = request.headers.get("Authorization")
+    if authorization:
+        return authorization
+    return request.client.host if request.client else ""
+
+
+def mark_write(request: Request):
+    if request.method not in READ_ONLY_METHODS:
+        recent_writers.set(_client_key(request), True)
+
+
+def _wrote_recently(request: Request) -> bool:
+    if recent_writers.get(_client_key(request)):
+        return True
+    try:
+        last_write = float(request.cookies.get(LAST_WRITE_COOKIE, ""))
+    except ValueError:
+        return False
+    return time.time() - last_write < settings.READ_YOUR_WRITES_SECONDS
+
+
+def get_read_engine(request: Request) -> Union[Engine, AsyncEngine]:
+    replica_router = get_replica_router()
+    if replica_router is None or _wrote_recently(request):
+        return get_async_engine() if settings.DB_ASYNC else get_engine()
+    return replica_router.choose()
+
+
+class ReadYourWritesMiddleware:
+    """Sends the time of a client's last write back to it as a cookie.
+
+    Whichever worker or instance serves the client's next read sees the cookie
+    and keeps it on the primary for READ_YOUR_WRITES_SECONDS.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] in READ_ONLY_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message):
+            if message["type"] == "http.response.start":
+                # Stamped once the handler has committed, as the response starts.
+                cookie = SimpleCookie({LAST_WRITE_COOKIE: f"{time.time():.3f}"})
+                cookie[LAST_WRITE_COOKIE].update(
+                    {
+                        "max-age": math.ceil(settings.READ_YOUR_WRITES_SECONDS),
+                        "path": "/",
+                        "httponly": True,
+                        "samesite": "lax",
+                    }
+                )
+                MutableHeaders(scope=message).append(
+                    "Set-Cookie", cookie.output(header="").strip()
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+def _get_sync_db(request: Request):
+    get_engine()
+    # Marked on the way in and out: the exit code may run after the response
+    # has been sent, and the window should start from the commit.
+    mark_write(request)
+    # Request sessions are discarded right after the response is rendered, so
+    # keep committed objects loaded instead of lazily refreshing them while
+    # serializing on the event loop.
+    db = SessionLocal(expire_on_commit=False)
     try:
         yield db
     finally:
         db.close()
+        mark_write(request)
+
+
+async def _get_async_db(request: Request):
+    get_async_engine()
+    mark_write(request)
+    try:
+        async with AsyncSessionLocal() as db:
+            yield db
+    finally:
+        mark_write(request)
+
+
+def _get_sync_read_db(request: Request):
+    db = SessionLocal(bind=get_read_engine(request), expire_on_commit=False)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def _get_async_read_db(request: Request):
+    async with AsyncSessionLocal(bind=get_read_engine(request)) as db:
+        yield db
+
+
+get_db = _get_async_db if settings.DB_ASYNC else _get_sync_db
+# For read-only routes: served by a replica when configured, except for clients
+# inside their read-your-writes window.
+get_read_db = _get_async_read_db if settings.DB_ASYNC else _get_sync_read_db
+
+
+async def run(db: Union[Session, AsyncSession], fn: Callable, *args, **kwargs) -> Any:
+    """Call a sync query function (``fn(db, ...)``) without blocking the loop.
+
+    Async sessions run it on their greenlet bridge, so concurrency is bounded by
+    the connection pool; sync sessions fall back to Starlette's threadpool.
+    """
+    if settings.DB_ASYNC:
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
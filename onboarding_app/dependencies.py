@@ -1,18 +1,35 @@
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
 
-from onboarding_app import database, exceptions, models
+from onboarding_app import database, exceptions, models, schemas
+from onboarding_app.cache import TTLCache
 from onboarding_app.config import settings
 from onboarding_app.queries import user as user_query
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/token")
 
+# username -> schemas.Principal
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAXSIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+# user id -> users.token_version, checked before trusting a principal
+token_version_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAXSIZE,
+    ttl=settings.TOKEN_VERSION_CACHE_TTL_SECONDS,
+)
 
-async def get_current_user(
+_PRIVILEGE_ATTRS = ("is_active", "is_admin")
+
+
+async def get_principal(
     db: Session = Depends(database.get_db), token: str = Depends(oauth2_scheme)
-) -> models.User:
+) -> schemas.Principal:
+    # FastAPI caches a dependency per request, so get_current_user and is_admin
+    # share a single token decode and user lookup.
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
@@ -20,23 +37,100 @@ async def get_current_user(
     except JWTError:
         raise exceptions.CredentialsError
 
-    user = user_query.get_user_by_username(db, payload.get("username"))
-    if not user.is_active:
-        raise exceptions.InactiveUserError
-    return user
+    if settings.STATELESS_TOKENS and "ver" in payload:
+        return await _get_stateless_principal(db, payload)
 
+    username = payload.get("username")
+    principal = principal_cache.get(username)
+    # Cached principals are only trusted while their token_version is current;
+    # the database bumps it on every privilege change, whoever makes it.
+    if principal is None or principal.token_version != await _get_token_version(
+        db, principal.id
+    ):
+        user = await database.run(db, user_query.get_user_by_username, username)
+        principal = schemas.Principal.from_orm(user)
+        principal_cache.set(username, principal)
+        token_version_cache.set(principal.id, principal.token_version)
+    return principal
 
-async def is_admin(
-    db: Session = Depends(database.get_db), token: str = Depends(oauth2_scheme)
-) -> bool:
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-    except JWTError:
+
+async def _get_stateless_principal(db: Session, payload: dict) -> schemas.Principal:
+    principal = schemas.Principal(
+        id=payload.get("uid"),
+        username=payload.get("username"),
+        is_active=payload.get("active"),
+        is_admin=payload.get("admin"),
+        token_version=payload.get("ver"),
+    )
+
+    # is_active/is_admin changes bump the version, revoking older tokens.
+    if principal.token_version != await _get_token_version(db, principal.id):
         raise exceptions.CredentialsError
+    return principal
+
+
+async def _get_token_version(db: Session, user_id: int) -> int:
+    current_version = token_version_cache.get(user_id)
+    if current_version is None:
+        try:
+            current_version = await database.run(
+                db, user_query.get_token_version, user_id
+            )
+        except exceptions.DataDoesNotExistError:
+            raise exceptions.CredentialsError
+        token_version_cache.set(user_id, current_version)
+    return current_version
+
 
-    user = user_query.get_user_by_username(db, payload.get("username"))
-    if not user.is_admin:
+async def get_current_user(
+    principal: schemas.Principal = Depends(get_principal),
+) -> schemas.Principal:
+    if not principal.is_active:
+        raise exceptions.InactiveUserError
+    return principal
+
+
+async def is_admin(principal: schemas.Principal = Depends(get_principal)) -> bool:
+    if not principal.is_admin:
         raise exceptions.PermissionDeniedError("관리자만 요청할 수 있습니다.")
     return True
+
+
+# Changes made through this process's sessions drop their cache entries on
+# commit; anything else is picked up once token_version_cache expires.
+def _invalidate_on_commit(session: Session, user_id: int, *usernames: str):
+    session.info.setdefault("principal_invalidations", set()).update(
+        (user_id, username) for username in usernames
+    )
+
+
+@event.listens_for(models.User, "after_update")
+def _collect_principal_invalidation(mapper, connection, target: models.User):
+    state = inspect(target)
+    if any(
+        state.attrs[attr].history.has_changes()
+        for attr in ("username", *_PRIVILEGE_ATTRS)
+    ):
+        _invalidate_on_commit(
+            state.session,
+            target.id,
+            target.username,
+            *state.attrs.username.history.deleted,
+        )
+
+
+@event.listens_for(models.User, "after_delete")
+def _collect_principal_deletion(mapper, connection, target: models.User):
+    _invalidate_on_commit(inspect(target).session, target.id, target.username)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_principals(session: Session):
+    for user_id, username in session.info.pop("principal_invalidations", ()):
+        principal_cache.pop(username)
+        token_version_cache.pop(user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_principal_invalidations(session: Session, previous_transaction):
+    session.info.pop("principal_invalidations", None)
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends
+
+from onboarding_app import database, dependencies, pool, schemas
+
+admin_router = APIRouter(tags=["admin"])
+
+
+@admin_router.get("/admin/pool", response_model=dict[str, schemas.PoolStatus])
+async def get_pool_status(is_admin: bool = Depends(dependencies.is_admin)):
+    # Same engines as the db_pool_* metrics; reading them must not open one.
+    return {
+        name: pool.get_pool_status(getattr(engine, "sync_engine", engine))
+        for name, engine in database.get_created_engines().items()
+    }
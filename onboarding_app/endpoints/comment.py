@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, Query, status
+from typing import Optional, Union
+
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
-from onboarding_app import database, dependencies, schemas
+from onboarding_app import database, dependencies, etag, schemas
 from onboarding_app.queries import comment as comment_query
 
 comment_router = APIRouter(tags=["comment"])
@@ -12,31 +14,63 @@ comment_router = APIRouter(tags=["comment"])
 @comment_router.post(
     "/wishlists/{wishlist_id}/comments", response_model=schemas.Comment
 )
-def create_comment(
+async def create_comment(
     wishlist_id: int,
     comment: schemas.CommentCreate,
     db: Session = Depends(database.get_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
 
-    return comment_query.create_comment(
-        db=db, current_user=current_user, comment=comment, wishlist_id=wishlist_id
+    return await database.run(
+        db,
+        comment_query.create_comment,
+        current_user=current_user,
+        comment=comment,
+        wishlist_id=wishlist_id,
     )
 
 
 @comment_router.get(
-    "/wishlists/{wishlist_id}/comments", response_model=list[schemas.Comment]
+    "/wishlists/{wishlist_id}/comments",
+    response_model=Union[list[schemas.Comment], schemas.CommentPage],
 )
-def fetch_comments(
+async def fetch_comments(
     wishlist_id: int,
-    db: Session = Depends(database.get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(database.get_read_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
     limit: int = Query(default=10),
     offset: int = Query(default=0),
+    cursor: Optional[str] = Query(default=None),
 ):
+    comments_etag = etag.make_etag(
+        request,
+        await database.run(
+            db,
+            comment_query.get_comments_version,
+            wishlist_id=wishlist_id,
+            current_user=current_user,
+        ),
+    )
+    if etag.matches(request, comments_etag):
+        return etag.not_modified(comments_etag)
+    response.headers["ETag"] = comments_etag
+
+    if cursor is not None:
+        comments, next_cursor = await database.run(
+            db,
+            comment_query.fetch_comments_page,
+            wishlist_id=wishlist_id,
+            current_user=current_user,
+            limit=limit,
+            cursor=cursor,
+        )
+        return {"items": comments, "next_cursor": next_cursor}
 
-    return comment_query.fetch_comments(
-        db=db,
+    return await database.run(
+        db,
+        comment_query.fetch_comments,
         wishlist_id=wishlist_id,
         current_user=current_user,
         limit=limit,
@@ -47,14 +81,15 @@ def fetch_comments(
 @comment_router.get(
     "/wishlists/{wishlist_id}/comments/{comment_id}", response_model=schemas.Comment
 )
-def get_comment(
+async def get_comment(
     wishlist_id: int,
     comment_id: int,
     current_user: schemas.User = Depends(dependencies.get_current_user),
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_read_db),
 ):
-    db_comment = comment_query.get_comment(
-        db=db,
+    db_comment = await database.run(
+        db,
+        comment_query.get_comment,
         wishlist_id=wishlist_id,
         current_user=current_user,
         comment_id=comment_id,
@@ -65,15 +100,16 @@ def get_comment(
 @comment_router.put(
     "/wishlists/{wishlist_id}/comments/{comment_id}", response_model=schemas.Comment
 )
-def update_comment(
+async def update_comment(
     wishlist_id: int,
     comment_id: int,
     comment: schemas.CommentCreate,
     db: Session = Depends(database.get_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
-    db_comment = comment_query.update_comment(
-        db=db,
+    db_comment = await database.run(
+        db,
+        comment_query.update_comment,
         current_user=current_user,
         comment=comment,
         wishlist_id=wishlist_id,
@@ -85,14 +121,15 @@ def update_comment(
 @comment_router.delete(
     "/wishlists/{wishlist_id}/comments/{comment_id}",
 )
-def delete_comment(
+async def delete_comment(
     wishlist_id: int,
     comment_id: int,
     db: Session = Depends(database.get_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
-    comment_query.delete_comment(
-        db=db,
+    await database.run(
+        db,
+        comment_query.delete_comment,
         current_user=current_user,
         wishlist_id=wishlist_id,
         comment_id=comment_id,
@@ -107,7 +144,7 @@ def delete_comment(
     "/wishlists/{wishlist_id}/comments/{comment_id}/replies",
     response_model=schemas.Comment,
 )
-def create_reply_to_comment(
+async def create_reply_to_comment(
     wishlist_id: int,
     comment_id: int,
     comment: schemas.CommentCreate,
@@ -115,8 +152,9 @@ def create_reply_to_comment(
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
 
-    return comment_query.create_comment(
-        db=db,
+    return await database.run(
+        db,
+        comment_query.create_comment,
         current_user=current_user,
         comment=comment,
         wishlist_id=wishlist_id,
@@ -129,14 +167,15 @@ def create_reply_to_comment(
     "/wishlists/{wishlist_id}/comments/{comment_id}/replies",
     response_model=list[schemas.Comment],
 )
-def fetch_replies(
+async def fetch_replies(
     wishlist_id: int,
     comment_id: int,
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_read_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
-    return comment_query.fetch_replies(
-        db=db,
+    return await database.run(
+        db,
+        comment_query.fetch_replies,
         current_user=current_user,
         wishlist_id=wishlist_id,
         parent_id=comment_id,
@@ -147,15 +186,16 @@ def fetch_replies(
     "/wishlists/{wishlist_id}/comments/{comment_id}/history",
     response_model=list[schemas.History],
 )
-def fetch_history(
+async def fetch_history(
     wishlist_id: int,
     comment_id: int,
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_read_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
     return jsonable_encoder(
-        comment_query.fetch_history(
-            db=db,
+        await database.run(
+            db,
+            comment_query.fetch_history,
             current_user=current_user,
             wishlist_id=wishlist_id,
             comment_id=comment_id,
@@ -1,4 +1,5 @@
 from datetime import timedelta
+from typing import Optional, Union
 
 from fastapi import APIRouter, Depends
 from fastapi.security import OAuth2PasswordRequestForm
@@ -12,18 +13,27 @@ user_router = APIRouter(tags=["user"])
 
 
 @user_router.post("/users/signup", response_model=schemas.User)
-def signup(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    return user_query.create_user(db=db, user=user)
+async def signup(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
+    hashed_password = await utils.get_password_hash_async(user.password1)
+    return await database.run(
+        db, user_query.create_user, user=user, hashed_password=hashed_password
+    )
 
 
-@user_router.get("/users", response_model=list[schemas.User])
-def fetch_users(
+@user_router.get("/users", response_model=Union[list[schemas.User], schemas.UserPage])
+async def fetch_users(
     offset: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(database.get_db),
     is_admin: bool = Depends(dependencies.is_admin),
 ):
-    return user_query.get_users(db, offset=offset, limit=limit)
+    if cursor is not None:
+        users, next_cursor = await database.run(
+            db, user_query.get_users_page, cursor=cursor, limit=limit
+        )
+        return {"items": users, "next_cursor": next_cursor}
+    return await database.run(db, user_query.get_users, offset=offset, limit=limit)
 
 
 # OAuth2
@@ -32,12 +42,20 @@ async def get_token(
     db: Session = Depends(database.get_db),
     form_data: OAuth2PasswordRequestForm = Depends(),
 ):
-    user = user_query.authenticate_user(
+    user = await user_query.authenticate_user(
         db=db, username=form_data.username, password=form_data.password
     )
     access_token_expires = timedelta(seconds=settings.ACCESS_TOKEN_EXPIRE_SECONDS)
+    token_data = {"username": user.username}
+    if settings.STATELESS_TOKENS:
+        token_data.update(
+            uid=user.id,
+            active=user.is_active,
+            admin=user.is_admin,
+            ver=user.token_version,
+        )
     access_token = utils.create_access_token(
-        data={"username": user.username}, expires_delta=access_token_expires
+        data=token_data, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -45,15 +63,16 @@ async def get_token(
 # TODO: 추후 필요성 판단후 기능 삭제
 @user_router.get("/users/me/", response_model=schemas.User)
 async def read_users_me(
-    current_user: schemas.User = Depends(dependencies.get_current_user),
+    db: Session = Depends(database.get_db),
+    current_user: schemas.Principal = Depends(dependencies.get_current_user),
 ):
-    return current_user
+    return await database.run(db, user_query.get_user, user_id=current_user.id)
 
 
 @user_router.get("/users/{user_id}", response_model=schemas.User)
-def get_user(
+async def get_user(
     user_id: int,
     db: Session = Depends(database.get_db),
     is_admin: models.User = Depends(dependencies.is_admin),
 ):
-    return user_query.get_user(db, user_id=user_id)
+    return await database.run(db, user_query.get_user, user_id=user_id)
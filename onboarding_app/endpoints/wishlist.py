@@ -1,24 +1,33 @@
-from typing import Literal
+from typing import Literal, Optional, Union
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Query,
+    Request,
+    Response,
+    status,
+)
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
-from onboarding_app import database, dependencies, schemas
+from onboarding_app import database, dependencies, etag, schemas
 from onboarding_app.queries import wishlist as wishlist_query
 
 wishlist_router = APIRouter(tags=["wishlist"])
 
 
 @wishlist_router.post("/wishlists", response_model=schemas.Wishlist)
-def create_wishlist(
+async def create_wishlist(
     wishlist: schemas.WishlistCreate,
     db: Session = Depends(database.get_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
-    db_wishlist = wishlist_query.create_wishlist(
-        db=db,
+    db_wishlist = await database.run(
+        db,
+        wishlist_query.create_wishlist,
         current_user=current_user,
         wishlist=wishlist,
     )
@@ -26,18 +35,47 @@ def create_wishlist(
     return jsonable_encoder(db_wishlist)
 
 
-@wishlist_router.get("/wishlists", response_model=list[schemas.Wishlist])
-def fetch_wishlists(
-    db: Session = Depends(database.get_db),
+@wishlist_router.get(
+    "/wishlists", response_model=Union[list[schemas.Wishlist], schemas.WishlistPage]
+)
+async def fetch_wishlists(
+    request: Request,
+    response: Response,
+    db: Session = Depends(database.get_read_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
     sort: Literal["created_at", "updated_at"] = "created_at",
     order_by: Literal["desc", "asc"] = "desc",
     limit: int = Query(default=10),
     offset: int = Query(default=0),
+    cursor: Optional[str] = Query(default=None),
 ):
+    wishlists_etag = etag.make_etag(
+        request,
+        await database.run(
+            db, wishlist_query.get_wishlists_version, current_user=current_user
+        ),
+    )
+    if etag.matches(request, wishlists_etag):
+        return etag.not_modified(wishlists_etag)
+    response.headers["ETag"] = wishlists_etag
 
-    db_wishlists = wishlist_query.fetch_wishlists(
-        db=db,
+    # Passing a cursor (empty for the first page) switches to keyset pagination,
+    # which returns {items, next_cursor} instead of a bare list.
+    if cursor is not None:
+        db_wishlists, next_cursor = await database.run(
+            db,
+            wishlist_query.fetch_wishlists_page,
+            current_user=current_user,
+            sort=sort,
+            order_by=order_by,
+            limit=limit,
+            cursor=cursor,
+        )
+        return jsonable_encoder({"items": db_wishlists, "next_cursor": next_cursor})
+
+    db_wishlists = await database.run(
+        db,
+        wishlist_query.fetch_wishlists,
         current_user=current_user,
         sort=sort,
         order_by=order_by,
@@ -47,27 +85,72 @@ def fetch_wishlists(
     return jsonable_encoder(db_wishlists)
 
 
+# Declared before the /wishlists/{wishlist_id} routes, which would match "summary".
+@wishlist_router.get("/wishlists/summary", response_model=schemas.PortfolioSummary)
+async def get_user_summary(
+    db: Session = Depends(database.get_read_db),
+    current_user: schemas.User = Depends(dependencies.get_current_user),
+):
+    return await database.run(
+        db, wishlist_query.get_user_summary, current_user=current_user
+    )
+
+
+# Declared before the /wishlists/{wishlist_id} routes, which would match "order".
+@wishlist_router.put("/wishlists/order", response_model=list[schemas.Wishlist])
+async def reorder_wishlists(
+    wishlist_order: schemas.WishlistOrderUpdate,
+    db: Session = Depends(database.get_db),
+    current_user: schemas.User = Depends(dependencies.get_current_user),
+):
+    db_wishlists = await database.run(
+        db,
+        wishlist_query.reorder_wishlists,
+        current_user=current_user,
+        wishlist_ids=wishlist_order.wishlist_ids,
+    )
+    return jsonable_encoder(db_wishlists)
+
+
 @wishlist_router.get("/wishlists/{wishlist_id}", response_model=schemas.Wishlist)
-def get_wishlist(
+async def get_wishlist(
     wishlist_id: int,
-    db: Session = Depends(database.get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(database.get_read_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
-    db_wishlist = wishlist_query.get_wishlist(
-        db=db, wishlist_id=wishlist_id, current_user=current_user
+    version = await database.run(
+        db,
+        wishlist_query.get_wishlist_version,
+        wishlist_id=wishlist_id,
+        current_user=current_user,
+    )
+    wishlist_etag = etag.make_etag(request, version)
+    if etag.matches(request, wishlist_etag):
+        return etag.not_modified(wishlist_etag)
+    response.headers["ETag"] = wishlist_etag
+
+    db_wishlist = await database.run(
+        db,
+        wishlist_query.get_wishlist,
+        wishlist_id=wishlist_id,
+        current_user=current_user,
+        version=version,
     )
     return jsonable_encoder(db_wishlist)
 
 
 @wishlist_router.put("/wishlists/{wishlist_id}", response_model=schemas.Wishlist)
-def update_wishlist(
+async def update_wishlist(
     wishlist_id: int,
     wishlist: schemas.WishlistUpdate,
     db: Session = Depends(database.get_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
-    db_wishlist = wishlist_query.update_wishlist(
-        db=db,
+    db_wishlist = await database.run(
+        db,
+        wishlist_query.update_wishlist,
         wishlist_id=wishlist_id,
         current_user=current_user,
         wishlist=wishlist,
@@ -76,13 +159,16 @@ def update_wishlist(
 
 
 @wishlist_router.delete("/wishlists/{wishlist_id}", response_model=schemas.Wishlist)
-def delete_wishlist(
+async def delete_wishlist(
     wishlist_id: int,
     db: Session = Depends(database.get_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
-    wishlist_query.delete_wishlist(
-        db=db, wishlist_id=wishlist_id, current_user=current_user
+    await database.run(
+        db,
+        wishlist_query.delete_wishlist,
+        wishlist_id=wishlist_id,
+        current_user=current_user,
     )
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -91,14 +177,20 @@ def delete_wishlist(
 
 
 @wishlist_router.put("/wishlists/{wishlist_id}/order", response_model=schemas.Wishlist)
-def change_wishlist_order(
+async def change_wishlist_order(
     wishlist_id: int,
     hope_order: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(database.get_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
-    updated_wishlist = wishlist_query.change_wishlist_order(
-        db=db, wishlist_id=wishlist_id, current_user=current_user, hope_order=hope_order
+    updated_wishlist = await database.run(
+        db,
+        wishlist_query.change_wishlist_order,
+        wishlist_id=wishlist_id,
+        current_user=current_user,
+        hope_order=hope_order,
+        background_tasks=background_tasks,
     )
     return jsonable_encoder(updated_wishlist)
 
@@ -106,14 +198,15 @@ def change_wishlist_order(
 @wishlist_router.post(
     "/wishlists/{wishlist_id}/stocks", response_model=schemas.WishStockResponse
 )
-def add_stock_to_wishlist(
+async def add_stock_to_wishlist(
     wishlist_id: int,
     wishstock: schemas.WishStockCreate,
     db: Session = Depends(database.get_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
-    db_wishstock = wishlist_query.add_stock_to_wishlist(
-        db=db,
+    db_wishstock = await database.run(
+        db,
+        wishlist_query.add_stock_to_wishlist,
         current_user=current_user,
         wishlist_id=wishlist_id,
         wishstock=wishstock,
@@ -121,17 +214,88 @@ def add_stock_to_wishlist(
     return db_wishstock
 
 
+@wishlist_router.post(
+    "/wishlists/{wishlist_id}/stocks/batch",
+    response_model=schemas.WishStockBatchResponse,
+)
+async def apply_stock_batch(
+    wishlist_id: int,
+    batch: schemas.WishStockBatch,
+    db: Session = Depends(database.get_db),
+    current_user: schemas.User = Depends(dependencies.get_current_user),
+):
+    return await database.run(
+        db,
+        wishlist_query.apply_stock_batch,
+        current_user=current_user,
+        wishlist_id=wishlist_id,
+        operations=batch.operations,
+    )
+
+
 @wishlist_router.get(
     "/wishlists/{wishlist_id}/stocks",
     response_model=list[schemas.WishStockResponse],
 )
-def fetch_stock_in_wishlist(
+async def fetch_stock_in_wishlist(
     wishlist_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(database.get_read_db),
+    current_user: schemas.User = Depends(dependencies.get_current_user),
+):
+    version = await database.run(
+        db,
+        wishlist_query.get_wishstocks_version,
+        current_user=current_user,
+        wishlist_id=wishlist_id,
+    )
+    wishstocks_etag = etag.make_etag(request, version)
+    if etag.matches(request, wishstocks_etag):
+        return etag.not_modified(wishstocks_etag)
+    response.headers["ETag"] = wishstocks_etag
+
+    return await database.run(
+        db,
+        wishlist_query.fetch_stock_in_wishlist,
+        current_user=current_user,
+        wishlist_id=wishlist_id,
+        version=version,
+    )
+
+
+@wishlist_router.get(
+    "/wishlists/{wishlist_id}/summary", response_model=schemas.PortfolioSummary
+)
+async def get_wishlist_summary(
+    wishlist_id: int,
+    db: Session = Depends(database.get_read_db),
+    current_user: schemas.User = Depends(dependencies.get_current_user),
+):
+    return await database.run(
+        db,
+        wishlist_query.get_wishlist_summary,
+        current_user=current_user,
+        wishlist_id=wishlist_id,
+    )
+
+
+@wishlist_router.put(
+    "/wishlists/{wishlist_id}/stocks/order",
+    response_model=list[schemas.WishStockResponse],
+)
+async def reorder_stocks_in_wishlist(
+    wishlist_id: int,
+    wishstock_order: schemas.WishStockOrderUpdate,
     db: Session = Depends(database.get_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
-    return wishlist_query.fetch_stock_in_wishlist(
-        db=db, current_user=current_user, wishlist_id=wishlist_id
+    return await database.run(
+        db,
+        wishlist_query.reorder_stocks_in_wishlist,
+        current_user=current_user,
+        wishlist_id=wishlist_id,
+        stock_ids=wishstock_order.stock_ids,
     )
 
 
@@ -139,14 +303,15 @@ def fetch_stock_in_wishlist(
     "/wishlists/{wishlist_id}/stocks/{stock_id}",
     response_model=schemas.WishStockResponse,
 )
-def get_stock_in_wishlist(
+async def get_stock_in_wishlist(
     wishlist_id: int,
     stock_id: int,
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_read_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
-    return wishlist_query.get_stock_in_wishlist(
-        db=db,
+    return await database.run(
+        db,
+        wishlist_query.get_stock_in_wishlist,
         current_user=current_user,
         wishlist_id=wishlist_id,
         stock_id=stock_id,
@@ -157,15 +322,16 @@ def get_stock_in_wishlist(
     "/wishlists/{wishlist_id}/stocks/{stock_id}",
     response_model=schemas.WishStockResponse,
 )
-def update_stock_in_wishlist(
+async def update_stock_in_wishlist(
     wishlist_id: int,
     stock_id: int,
     wishstock: schemas.WishStockUpdate,
     db: Session = Depends(database.get_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
-    return wishlist_query.update_stock_in_wishlist(
-        db=db,
+    return await database.run(
+        db,
+        wishlist_query.update_stock_in_wishlist,
         current_user=current_user,
         wishlist_id=wishlist_id,
         stock_id=stock_id,
@@ -177,14 +343,15 @@ def update_stock_in_wishlist(
     "/wishlists/{wishlist_id}/stocks/{stock_id}",
     response_model=schemas.WishStockResponse,
 )
-def delete_stock_in_wishlist(
+async def delete_stock_in_wishlist(
     wishlist_id: int,
     stock_id: int,
     db: Session = Depends(database.get_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
-    wishlist_query.delete_stock_in_wishlist(
-        db=db,
+    await database.run(
+        db,
+        wishlist_query.delete_stock_in_wishlist,
         current_user=current_user,
         wishlist_id=wishlist_id,
         stock_id=stock_id,
@@ -200,17 +367,20 @@ def delete_stock_in_wishlist(
     "/wishlists/{wishlist_id}/stocks/{stock_id}/order",
     response_model=schemas.WishStockResponse,
 )
-def change_stock_order(
+async def change_stock_order(
     wishlist_id: int,
     stock_id: int,
     hope_order: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(database.get_db),
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
-    return wishlist_query.change_stock_order(
-        db=db,
+    return await database.run(
+        db,
+        wishlist_query.change_stock_order,
         current_user=current_user,
         wishlist_id=wishlist_id,
         stock_id=stock_id,
         hope_order=hope_order,
+        background_tasks=background_tasks,
     )
@@ -0,0 +1,31 @@
+import hashlib
+
+from fastapi import Request, Response, status
+
+
+def make_etag(request: Request, version: str) -> str:
+    """Strong ETag for a read, from the route's version data and its query string.
+
+    ``version`` comes from a cheap version query, so the tag is known before
+    (and without) building the response body.
+    """
+    digest = hashlib.sha1(
+        f"{request.url.path}?{request.url.query}#{version}".encode()
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def matches(request: Request, etag: str) -> bool:
+    # If-None-Match uses the weak comparison (RFC 7232 3.2).
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (
+        candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
@@ -22,6 +22,10 @@ class FileOpenError(OnboardingException):
     ...
 
 
+class InvalidFileError(OnboardingException):
+    ...
+
+
 class PermissionDeniedError(OnboardingException):
     ...
 
@@ -32,3 +36,7 @@ class InvalidQueryError(OnboardingException):
 
 class StockNotFoundError(OnboardingException):
     ...
+
+
+class ServerBusyError(OnboardingException):
+    ...
@@ -2,17 +2,26 @@ from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
 
 from onboarding_app import exceptions
-from onboarding_app.database import Base, engine
+from onboarding_app.database import ReadYourWritesMiddleware
+from onboarding_app.endpoints.admin import admin_router
 from onboarding_app.endpoints.comment import comment_router
+from onboarding_app.endpoints.metrics import metrics_router
 from onboarding_app.endpoints.user import user_router
 from onboarding_app.endpoints.wishlist import wishlist_router
-
-Base.metadata.create_all(bind=engine)
+from onboarding_app.metrics import MetricsMiddleware
+from onboarding_app.profiling import QueryCounterMiddleware
 
 app = FastAPI()
+# Middleware added last runs first: metrics read the statement counts that
+# QueryCounterMiddleware collects around them.
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(QueryCounterMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
 app.include_router(user_router)
 app.include_router(wishlist_router)
 app.include_router(comment_router)
+app.include_router(admin_router)
+app.include_router(metrics_router)
 
 
 @app.exception_handler(exceptions.CredentialsError)
@@ -84,3 +93,14 @@ async def stock_not_found_exception_handler(
         status_code=status.HTTP_404_NOT_FOUND,
         content="Stock not found",
     )
+
+
+@app.exception_handler(exceptions.ServerBusyError)
+async def server_busy_exception_handler(
+    request: Request, exc: exceptions.ServerBusyError
+):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content="Server is busy",
+        headers={"Retry-After": "1"},
+    )
@@ -0,0 +1,226 @@
+import bisect
+import threading
+import time
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from onboarding_app import database, pool, profiling
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout."""
+
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self) -> Iterable[tuple[str, int]]:
+        cumulative = 0
+        for bucket, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield _format_value(bucket), cumulative
+        yield "+Inf", cumulative + self.counts[-1]
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class RequestMetrics:
+    """In-process request counters, keyed by method and route template."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: defaultdict[tuple[str, str, str], int] = defaultdict(int)
+        self.active: dict[int, Scope] = {}
+        self.latency: dict[tuple[str, str], Histogram] = {}
+        self.db_time: dict[tuple[str, str], Histogram] = {}
+        self.db_statements: dict[tuple[str, str], Histogram] = {}
+
+    def start(self, scope: Scope):
+        with self._lock:
+            self.active[id(scope)] = scope
+
+    def finish(
+        self,
+        scope: Scope,
+        status: int,
+        duration_seconds: float,
+        stats: Optional[profiling.QueryStats],
+    ):
+        key = _route_key(scope)
+        with self._lock:
+            del self.active[id(scope)]
+            self.requests[(*key, str(status))] += 1
+            _histogram(self.latency, key, LATENCY_BUCKETS).observe(duration_seconds)
+            if stats is not None:
+                _histogram(self.db_time, key, LATENCY_BUCKETS).observe(
+                    stats.duration_seconds
+                )
+                _histogram(self.db_statements, key, STATEMENT_BUCKETS).observe(
+                    stats.count
+                )
+
+    def render(self) -> list[str]:
+        with self._lock:
+            lines = [
+                "# HELP http_requests_total Requests served, by route and status.",
+                "# TYPE http_requests_total counter",
+            ]
+            for (method, route, status), count in sorted(self.requests.items()):
+                labels = _labels(method=method, route=route, status=status)
+                lines.append(f"http_requests_total{labels} {count}")
+
+            lines += [
+                "# HELP http_requests_in_progress Requests being served, by route.",
+                "# TYPE http_requests_in_progress gauge",
+            ]
+            # The route is resolved at scrape time: requests still being routed
+            # count as unmatched.
+            in_progress = dict.fromkeys(self.latency, 0)
+            for scope in self.active.values():
+                key = _route_key(scope)
+                in_progress[key] = in_progress.get(key, 0) + 1
+            for (method, route), count in sorted(in_progress.items()):
+                labels = _labels(method=method, route=route)
+                lines.append(f"http_requests_in_progress{labels} {count}")
+
+            lines += _render_histograms(
+                "http_request_duration_seconds",
+                "Request latency, by route.",
+                self.latency,
+            )
+            lines += _render_histograms(
+                "db_request_duration_seconds",
+                "Database time spent per request, by route.",
+                self.db_time,
+            )
+            lines += _render_histograms(
+                "db_statements_per_request",
+                "SQL statements issued per request, by route.",
+                self.db_statements,
+            )
+        return lines
+
+
+request_metrics = RequestMetrics()
+
+
+class MetricsMiddleware:
+    """Feeds request_metrics. Must run inside QueryCounterMiddleware."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started_at = time.perf_counter()
+        request_metrics.start(scope)
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_metrics.finish(
+                scope,
+                status,
+                time.perf_counter() - started_at,
+                profiling.get_query_stats(),
+            )
+
+
+def render() -> str:
+    lines = request_metrics.render() + _render_pool_metrics()
+    return "\n".join(lines) + "\n"
+
+
+def _render_pool_metrics() -> list[str]:
+    pool_metrics = {
+        "db_pool_size": ("gauge", "size", "Configured pool size."),
+        "db_pool_checked_out": ("gauge", "checked_out", "Connections in use."),
+        "db_pool_overflow": ("gauge", "overflow", "Overflow connections open."),
+        "db_pool_checkouts_total": ("counter", "checkouts", "Connection checkouts."),
+        "db_pool_timeouts_total": ("counter", "timeouts", "Checkouts timed out."),
+        "db_pool_wait_seconds_total": (
+            "counter",
+            "wait_seconds_total",
+            "Time spent waiting for a connection.",
+        ),
+    }
+    statuses = {
+        name: pool.get_pool_status(getattr(engine, "sync_engine", engine))
+        for name, engine in database.get_created_engines().items()
+    }
+    lines = []
+    for metric, (metric_type, key, description) in pool_metrics.items():
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} {metric_type}"]
+        for name, status in statuses.items():
+            if key in status:
+                lines.append(
+                    f"{metric}{_labels(pool=name)} {_format_value(status[key])}"
+                )
+    return lines
+
+
+def _route_key(scope: Scope) -> tuple[str, str]:
+    # FastAPI puts the matched route in the scope; raw paths would give every
+    # wishlist id its own series.
+    route = scope.get("route")
+    return scope["method"], route.path if route is not None else UNMATCHED_ROUTE
+
+
+def _histogram(
+    histograms: dict[tuple[str, str], Histogram],
+    key: tuple[str, str],
+    buckets: Iterable[float],
+) -> Histogram:
+    if key not in histograms:
+        histograms[key] = Histogram(buckets)
+    return histograms[key]
+
+
+def _render_histograms(
+    metric: str, description: str, histograms: dict[tuple[str, str], Histogram]
+) -> list[str]:
+    lines = [f"# HELP {metric} {description}", f"# TYPE {metric} histogram"]
+    for (method, route), histogram in sorted(histograms.items()):
+        for bucket, count in histogram.samples():
+            labels = _labels(method=method, route=route, le=bucket)
+            lines.append(f"{metric}_bucket{labels} {count}")
+        labels = _labels(method=method, route=route)
+        lines.append(f"{metric}_sum{labels} {_format_value(histogram.sum)}")
+        lines.append(f"{metric}_count{labels} {histogram.count}")
+    return lines
+
+
+def _labels(**labels: str) -> str:
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -1,17 +1,29 @@
 from datetime import datetime
 
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
+    Date,
     DateTime,
+    DDL,
+    event,
+    FetchedValue,
     ForeignKey,
+    func,
+    Index,
     Integer,
+    Numeric,
+    select,
     String,
+    tuple_,
     UniqueConstraint,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import aliased, column_property, relationship
+from sqlalchemy.orm.attributes import set_committed_value
 
-from onboarding_app.database import Base, engine
+from onboarding_app.config import settings
+from onboarding_app.database import Base
 
 
 class User(Base):
@@ -23,10 +35,51 @@ class User(Base):
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
+    # Bumped by the users_bump_token_version trigger, so privilege changes made
+    # outside the ORM (admin SQL, bulk updates, other workers) revoke tokens too.
+    token_version = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+        server_onupdate=FetchedValue(),
+    )
 
     wishlists = relationship("Wishlist", backref="user")
 
 
+event.listen(
+    User.__table__,
+    "after_create",
+    DDL(
+        """
+        CREATE OR REPLACE FUNCTION bump_users_token_version() RETURNS trigger AS $$
+        BEGIN
+            NEW.token_version := OLD.token_version + 1;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    ).execute_if(dialect="postgresql"),
+)
+event.listen(
+    User.__table__,
+    "after_create",
+    DDL(
+        """
+        CREATE TRIGGER users_bump_token_version
+        BEFORE UPDATE OF is_active, is_admin ON users
+        FOR EACH ROW
+        WHEN (
+            OLD.is_active IS DISTINCT FROM NEW.is_active
+            OR OLD.is_admin IS DISTINCT FROM NEW.is_admin
+        )
+        EXECUTE FUNCTION bump_users_token_version()
+        """
+    ).execute_if(dialect="postgresql"),
+)
+
+
 class Stock(Base):
     __tablename__ = "stocks"
 
@@ -34,7 +87,56 @@ class Stock(Base):
     code = Column(String, unique=True, index=True)
     market = Column(String, index=True)
     name = Column(String, index=True)
-    price = Column(Integer, index=True, default=0)
+    # Latest close, denormalized from stock_prices; price_date is the trade date
+    # it last moved on.
+    price = Column(Integer, default=0)
+    price_date = Column(Date, nullable=True)
+
+
+class StockPrice(Base):
+    __tablename__ = "stock_prices"
+
+    # SQLite only autoincrements INTEGER primary keys (scripts run on it locally).
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    )
+    stock_id = Column(
+        Integer, ForeignKey("stocks.id", ondelete="CASCADE"), nullable=False
+    )
+    date = Column(Date, nullable=False)
+    __table_args__ = (
+        UniqueConstraint("stock_id", "date", name="stock_id__date_unique"),
+    )
+
+    open = Column(BigInteger)
+    high = Column(BigInteger)
+    low = Column(BigInteger)
+    close = Column(BigInteger, nullable=False)
+    change = Column(BigInteger)
+    change_rate = Column(Numeric(10, 2))
+    volume = Column(BigInteger)
+    traded_value = Column(BigInteger)
+    market_cap = Column(BigInteger)
+    shares_outstanding = Column(BigInteger)
+
+
+class StockPriceFile(Base):
+    """Ledger of KRX price files already loaded, so reruns skip them."""
+
+    __tablename__ = "stock_price_files"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    file_name = Column(String, nullable=False)
+    # sha256 of the file bytes; a corrected file for the same day loads again.
+    checksum = Column(String(64), unique=True, nullable=False)
+    trade_date = Column(Date, nullable=False, index=True)
+    applied_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    inserted = Column(Integer, nullable=False)
+    updated = Column(Integer, nullable=False)
+    unchanged = Column(Integer, nullable=False)
+    delisted = Column(Integer, nullable=False)
 
 
 class Wishlist(Base):
@@ -43,13 +145,20 @@ class Wishlist(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     name = Column(String, index=True)
-    __table_args__ = (UniqueConstraint("user_id", "name", name="user_id__name_unique"),)
+    __table_args__ = (
+        UniqueConstraint("user_id", "name", name="user_id__name_unique"),
+        Index("ix_wishlists_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_wishlists_user_id_updated_at_id", "user_id", "updated_at", "id"),
+        Index("ix_wishlists_user_id_order_num", "user_id", "order_num"),
+    )
 
     description = Column(String)
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
     updated_at = Column(DateTime(timezone=True), default=datetime.utcnow)
     is_open = Column(Boolean, default=False)
-    order_num = Column(Integer, nullable=True)
+    order_key = Column("order_num", Integer, nullable=True)
+    # Bumped with every change to the wishlist, its stocks or its position.
+    version = Column(Integer, nullable=False, default=0, server_default="0")
 
 
 class WishlistXstock(Base):
@@ -62,11 +171,12 @@ class WishlistXstock(Base):
         UniqueConstraint(
             "wishlist_id", "stock_id", name="wishlist_id__stock_id_unique"
         ),
+        Index("ix_wishlist_x_stock_wishlist_id_order_num", "wishlist_id", "order_num"),
     )
 
     purchase_price = Column(Integer, nullable=True)
     holding_num = Column(Integer, nullable=True)
-    order_num = Column(Integer, nullable=True)
+    order_key = Column("order_num", Integer, nullable=True)
 
 
 class Comment(Base):
@@ -78,6 +188,10 @@ class Comment(Base):
     content = Column(String)
     parent_id = Column(Integer, ForeignKey("comments.id", ondelete="CASCADE"))
     is_reply = Column(Boolean)
+    __table_args__ = (
+        Index("ix_comments_wishlist_id_id", "wishlist_id", "id"),
+        Index("ix_comments_parent_id", "parent_id"),
+    )
 
     replies = relationship("Comment")
 
@@ -89,11 +203,48 @@ class History(Base):
     comment_id = Column(Integer, ForeignKey("comments.id", ondelete="CASCADE"))
     content = Column(String)
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    __table_args__ = (
+        Index("ix_historys_comment_id_created_at", "comment_id", "created_at"),
+    )
+
+
+def _position_among_siblings(model: type, parent_key: str):
+    # Rows sort by (order_key, id); the API shows the 0-based position in that
+    # order, whether the keys are dense or sparse (see onboarding_app.ordering).
+    # Deferred: only the read paths that return order_num load the count, via
+    # ordering.position / ordering.position_options.
+    sibling = aliased(model)
+    event.listen(model, "load", _position_from_dense_key)
+    event.listen(model, "refresh", _position_from_dense_key)
+    return column_property(
+        select(func.count(sibling.id))
+        .where(
+            getattr(sibling, parent_key) == getattr(model, parent_key),
+            tuple_(sibling.order_key, sibling.id) < tuple_(model.order_key, model.id),
+        )
+        .correlate_except(sibling)
+        .scalar_subquery(),
+        deferred=True,
+        # Kept up to date by onboarding_app.ordering instead of being reloaded
+        # after every flush.
+        expire_on_flush=False,
+    )
+
+
+def _position_from_dense_key(target, *args):
+    # Dense keys are the positions themselves, so no count is needed.
+    if settings.ORDER_MODE == "dense" and "order_key" in target.__dict__:
+        set_committed_value(target, "order_num", target.order_key)
+
+
+Wishlist.order_num = _position_among_siblings(Wishlist, "user_id")
+WishlistXstock.order_num = _position_among_siblings(WishlistXstock, "wishlist_id")
+
+
+class CacheVersion(Base):
+    """Named counters for data that many cache entries depend on."""
 
+    __tablename__ = "cache_versions"
 
-User.__table__.create(bind=engine, checkfirst=True)
-Stock.__table__.create(bind=engine, checkfirst=True)
-Wishlist.__table__.create(bind=engine, checkfirst=True)
-WishlistXstock.__table__.create(bind=engine, checkfirst=True)
-Comment.__table__.create(bind=engine, checkfirst=True)
-History.__table__.create(bind=engine, checkfirst=True)
+    name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
@@ -0,0 +1,269 @@
+"""Ordering of a user's wishlists and of the stocks in a wishlist.
+
+Rows store a sort key (``order_key``, the ``order_num`` column) and the API
+shows the dense 0-based position derived from it (the deferred ``order_num``
+column properties on the models). In dense mode that position is the stored
+key; in sparse mode it is a count of the preceding siblings, which only the
+read paths that return it load (``position`` and ``position_options``).
+
+In ``dense`` ORDER_MODE the keys are the positions themselves: a move shifts
+every row in between and a delete renumbers the rows after it. In ``sparse``
+mode keys start ORDER_KEY_GAP apart, a move rewrites only the moved row (its
+key becomes the midpoint of its new neighbours) and a delete leaves a hole.
+Once a move uses up the gap between two keys, the list is compacted in the
+background.
+
+Switching from sparse to dense needs a compaction of every list
+(scripts/compact_order.py). Until then a dense move compacts its own list
+first, but dense reads would show the leftover sparse keys as positions.
+"""
+from typing import Optional
+
+from fastapi import BackgroundTasks
+from sqlalchemy import case, func, update
+from sqlalchemy.orm import Session, undefer
+from sqlalchemy.orm.attributes import InstrumentedAttribute, set_committed_value
+
+from onboarding_app import database, exceptions, utils
+from onboarding_app.config import settings
+from onboarding_app.database import Base
+
+ORDER_KEY_GAP = 1024
+# Keys only grow or shrink by ORDER_KEY_GAP per move to an end; compact well
+# before they approach the 32-bit column limit.
+MAX_ORDER_KEY = 2**30
+
+
+def position(model: type):
+    """SQL for the ``order_num`` of a ``model`` row, to select alongside it."""
+    if settings.ORDER_MODE == "dense":
+        return model.order_key
+    return model.order_num
+
+
+def position_options(model: type) -> list:
+    """Loader options for queries that return ``model`` rows with order_num."""
+    if settings.ORDER_MODE == "dense":
+        # The models copy the stored key into order_num as rows load.
+        return []
+    return [undefer(model.order_num)]
+
+
+def append(db: Session, target: Base, parent_column: InstrumentedAttribute):
+    """Place a new ``target`` at the end of its list."""
+    model = target.__class__
+    count, last_key = (
+        db.query(func.count(model.id), func.max(model.order_key))
+        .filter(parent_column == getattr(target, parent_column.key))
+        .one()
+    )
+    if settings.ORDER_MODE == "dense":
+        target.order_key = count
+    else:
+        target.order_key = 0 if last_key is None else last_key + ORDER_KEY_GAP
+    set_committed_value(target, "order_num", count)
+
+
+def keys_after(last_key: Optional[int], count: int) -> list[int]:
+    """Keys for ``count`` rows appended after the row keyed ``last_key``."""
+    gap = _key_gap()
+    first_key = 0 if last_key is None else last_key + gap
+    return [first_key + i * gap for i in range(count)]
+
+
+def _key_gap() -> int:
+    return 1 if settings.ORDER_MODE == "dense" else ORDER_KEY_GAP
+
+
+def move(
+    db: Session,
+    target: Base,
+    parent_column: InstrumentedAttribute,
+    hope_order: int,
+    background_tasks: Optional[BackgroundTasks] = None,
+):
+    """Move ``target`` to position ``hope_order`` in its list. Caller commits."""
+    parent_id = getattr(target, parent_column.key)
+    if settings.ORDER_MODE == "dense":
+        utils.reorder(
+            target_model_obj=target,
+            hope_order=hope_order,
+            modelList_query_res_by_foreign_key=db.query(target.__class__).filter(
+                parent_column == parent_id
+            ),
+            list_size=_ensure_dense_keys(db, target, parent_column, parent_id),
+        )
+    elif _move_sparse(db, target, parent_column, hope_order):
+        if background_tasks is not None:
+            background_tasks.add_task(compact_in_background, parent_column, parent_id)
+    set_committed_value(target, "order_num", hope_order)
+
+
+def _ensure_dense_keys(
+    db: Session, target: Base, parent_column: InstrumentedAttribute, parent_id: int
+) -> int:
+    """Compact a list whose keys are not its positions; returns its length.
+
+    Keys written in sparse mode stay sparse until compacted; shifting them by
+    one would leave the moved row at the wrong position.
+    """
+    model = target.__class__
+    count, distinct_keys, first_key, last_key = (
+        db.query(
+            func.count(model.id),
+            func.count(model.order_key.distinct()),
+            func.min(model.order_key),
+            func.max(model.order_key),
+        )
+        .filter(parent_column == parent_id)
+        .one()
+    )
+    if (distinct_keys, first_key, last_key) != (count, 0, count - 1):
+        compact(db, parent_column, parent_id)
+        db.refresh(target, ["order_key"])
+    return count
+
+
+def _move_sparse(
+    db: Session,
+    target: Base,
+    parent_column: InstrumentedAttribute,
+    hope_order: int,
+) -> bool:
+    """Rewrite the key of ``target`` only; returns True if compaction is due."""
+    if hope_order < 0:
+        raise exceptions.InvalidQueryError
+    if hope_order == target.order_num:
+        return False
+
+    model = target.__class__
+    parent_id = getattr(target, parent_column.key)
+    # The other rows' keys around the new position, found without counting the
+    # list: an empty result past position 0 means hope_order is out of range.
+    neighbour_keys = [
+        order_key
+        for (order_key,) in db.query(model.order_key)
+        .filter(parent_column == parent_id, model.id != target.id)
+        .order_by(model.order_key, model.id)
+        .offset(max(hope_order - 1, 0))
+        .limit(2)
+    ]
+    if hope_order > 0 and not neighbour_keys:
+        raise exceptions.InvalidQueryError
+    if hope_order == 0:
+        neighbour_keys.insert(0, None)
+    before, after = (neighbour_keys + [None])[:2]
+
+    if before is None and after is None:
+        return False
+    if before is None:
+        order_key = after - ORDER_KEY_GAP
+    elif after is None:
+        order_key = before + ORDER_KEY_GAP
+    elif after - before > 1:
+        order_key = (before + after) // 2
+    else:
+        # No room left between the neighbours: compact now and place again.
+        compact(db, parent_column, parent_id)
+        return _move_sparse(db, target, parent_column, hope_order)
+
+    target.order_key = order_key
+    tightest_gap = min(
+        abs(order_key - key) for key in (before, after) if key is not None
+    )
+    return tightest_gap <= 1 or abs(order_key) >= MAX_ORDER_KEY
+
+
+def reorder_all(
+    db: Session,
+    parent_column: InstrumentedAttribute,
+    parent_id: int,
+    member_column: InstrumentedAttribute,
+    member_ids: list[int],
+):
+    """Give a whole list a new order in one UPDATE. Caller commits.
+
+    ``member_ids`` lists every row's ``member_column`` value in the new order;
+    anything but a permutation of the current rows is an InvalidQueryError.
+    """
+    model = parent_column.class_
+    # Locking the rows makes concurrent reorders of the same list take turns.
+    current_ids = [
+        member_id
+        for (member_id,) in db.query(member_column)
+        .filter(parent_column == parent_id)
+        .with_for_update()
+    ]
+    if len(member_ids) != len(current_ids) or set(member_ids) != set(current_ids):
+        raise exceptions.InvalidQueryError
+    if not member_ids:
+        return
+
+    gap = _key_gap()
+    new_key = case(
+        {member_id: position * gap for position, member_id in enumerate(member_ids)},
+        value=member_column,
+    )
+    db.execute(
+        update(model)
+        .where(parent_column == parent_id, model.order_key.is_distinct_from(new_key))
+        .values({model.order_key: new_key})
+        .execution_options(synchronize_session=False)
+    )
+
+
+def close_gap(db: Session, parent_column: InstrumentedAttribute, parent_id: int):
+    """Called after a row is deleted from a list. Caller commits."""
+    if settings.ORDER_MODE == "dense":
+        compact(db, parent_column, parent_id)
+
+
+def compact(
+    db: Session, parent_column: InstrumentedAttribute, parent_id: Optional[int] = None
+):
+    """Respace a list's keys evenly in one UPDATE, keeping their order.
+
+    Without ``parent_id`` every list of the model is compacted, as needed once
+    after switching ORDER_MODE (see scripts/compact_order.py).
+    """
+    model = parent_column.class_
+    gap = _key_gap()
+    position = (
+        func.row_number().over(
+            partition_by=parent_column, order_by=(model.order_key, model.id)
+        )
+        - 1
+    )
+    ranked = db.query(model.id, position.label("position"))
+    if parent_id is not None:
+        ranked = ranked.filter(parent_column == parent_id)
+    ranked = ranked.subquery()
+    new_key = ranked.c.position * gap
+    db.execute(
+        update(model)
+        .where(model.id == ranked.c.id, model.order_key.is_distinct_from(new_key))
+        .values({model.order_key: new_key})
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def compact_in_background(parent_column: InstrumentedAttribute, parent_id: int):
+    # Runs after the response, on the engine (and pool) the requests use.
+    if settings.DB_ASYNC:
+        database.get_async_engine()
+        async with database.AsyncSessionLocal() as db:
+            await database.run(db, _compact_and_commit, parent_column, parent_id)
+        return
+    database.get_engine()
+    db = database.SessionLocal()
+    try:
+        await database.run(db, _compact_and_commit, parent_column, parent_id)
+    finally:
+        db.close()
+
+
+def _compact_and_commit(
+    db: Session, parent_column: InstrumentedAttribute, parent_id: int
+):
+    compact(db, parent_column, parent_id)
+    db.commit()
@@ -0,0 +1,77 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import asc, desc, literal, tuple_
+from sqlalchemy.orm import Query
+
+from onboarding_app import exceptions
+
+
+def encode_cursor(key: str, values: list) -> str:
+    """Opaque token for the row after which the next page starts.
+
+    ``key`` names the ordering (e.g. ``"created_at:desc"``) so a cursor cannot
+    be replayed against a different sort.
+    """
+    values = [
+        value.isoformat() if isinstance(value, datetime) else value for value in values
+    ]
+    payload = json.dumps([key, values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_key, values = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise exceptions.InvalidQueryError
+    if cursor_key != key or not isinstance(values, list):
+        raise exceptions.InvalidQueryError
+    return values
+
+
+def keyset_page(
+    query: Query,
+    columns: list,
+    descending: bool,
+    after: Optional[list[Any]],
+    limit: int,
+) -> tuple[list, bool]:
+    """Rows ordered by ``columns`` that come after ``after``, plus a has-more flag.
+
+    The last column must be unique (the primary key) so the order is total.
+    """
+    if limit < 0:
+        raise exceptions.InvalidQueryError
+    if limit == 0:
+        return [], False
+    if after is not None:
+        if len(after) != len(columns):
+            raise exceptions.InvalidQueryError
+        bound = tuple_(
+            *(
+                literal(_cursor_value(column, value), column.type)
+                for column, value in zip(columns, after)
+            )
+        )
+        key = tuple_(*columns)
+        query = query.filter(key < bound if descending else key > bound)
+    direction = desc if descending else asc
+    rows = query.order_by(*map(direction, columns)).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
+
+
+def _cursor_value(column, value: Any) -> Any:
+    python_type = column.type.python_type
+    try:
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        if isinstance(value, python_type) and not isinstance(value, bool):
+            return value
+    except (TypeError, ValueError):
+        pass
+    raise exceptions.InvalidQueryError
@@ -0,0 +1,122 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from onboarding_app import slow_query
+from onboarding_app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """SQL statements issued while serving one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration_seconds = 0.0
+        self.statements: Counter[str] = Counter()
+        self.scope: Optional[Scope] = None
+
+    def record(self, statement: str, duration_seconds: float):
+        self.count += 1
+        self.duration_seconds += duration_seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [
+            (statement, count)
+            for statement, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+# The stats object is shared, not copied, with the threadpool and greenlet
+# contexts the sessions run in, so their statements land on the request.
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "query_stats", default=None
+)
+
+
+def get_query_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started_at"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    duration_seconds = time.perf_counter() - conn.info.pop("query_started_at")
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, duration_seconds)
+    slow_query.log_if_slow(
+        conn,
+        statement,
+        parameters,
+        executemany,
+        duration_seconds,
+        stats.scope if stats is not None else None,
+    )
+
+
+class QueryCounterMiddleware:
+    """Counts the SQL statements and database time of every HTTP request.
+
+    Totals are logged when the request finishes, with a warning for statements
+    repeated ``N_PLUS_ONE_THRESHOLD`` times or more, which usually means a query
+    is issued per row. In DEBUG mode they are also sent as ``X-DB-Query-Count``
+    and ``X-DB-Time-Ms`` headers.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        # The router fills in scope["endpoint"] once the route is matched.
+        stats.scope = scope
+        token = _current_stats.set(stats)
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start" and settings.DEBUG:
+                headers = MutableHeaders(scope=message)
+                headers["X-DB-Query-Count"] = str(stats.count)
+                headers["X-DB-Time-Ms"] = f"{stats.duration_seconds * 1000:.2f}"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current_stats.reset(token)
+            _log_stats(scope, stats)
+
+
+def _log_stats(scope: Scope, stats: QueryStats):
+    request_line = f"{scope['method']} {scope['path']}"
+    logger.info(
+        "%s: %d statements, %.2f ms in the database",
+        request_line,
+        stats.count,
+        stats.duration_seconds * 1000,
+    )
+    for statement, count in stats.repeated(settings.N_PLUS_ONE_THRESHOLD):
+        logger.warning(
+            "%s: possible N+1, statement issued %d times: %s",
+            request_line,
+            count,
+            " ".join(statement.split()),
+        )
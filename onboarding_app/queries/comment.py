@@ -1,21 +1,10 @@
 from typing import Optional
 
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from onboarding_app import exceptions, models, schemas
-
-
-def get_accessible_wishlist(
-    db: Session, wishlist_id: int, current_user: schemas.User
-) -> models.Wishlist:
-    wishlist = (
-        db.query(models.Wishlist).filter(models.Wishlist.id == wishlist_id).first()
-    )
-    if not wishlist:
-        raise exceptions.DataDoesNotExistError
-    if not wishlist.is_open and wishlist.user_id != current_user.id:
-        raise exceptions.PermissionDeniedError
-    return wishlist
+from onboarding_app import exceptions, models, pagination, schemas
+from onboarding_app.queries.wishlist import access_condition, get_accessible_wishlist
 
 
 def create_comment(
@@ -27,7 +16,7 @@ def create_comment(
     is_reply: bool = False,
 ) -> models.Comment:
 
-    wishlist = get_accessible_wishlist(db, wishlist_id, current_user)
+    wishlist = get_accessible_wishlist(db, wishlist_id, current_user, owner_only=False)
     created_comment = models.Comment(
         user_id=current_user.id,
         wishlist_id=wishlist.id,
@@ -57,23 +46,78 @@ def fetch_comments(
     limit: int,
     offset: int,
 ) -> list[models.Comment]:
-    wishlist = get_accessible_wishlist(db, wishlist_id, current_user)
+    wishlist = get_accessible_wishlist(db, wishlist_id, current_user, owner_only=False)
     return (
         db.query(models.Comment)
         .filter(models.Comment.wishlist_id == wishlist.id)
+        .order_by(models.Comment.id)
         .limit(limit)
         .offset(offset)
         .all()
     )
 
 
+def get_comments_version(
+    db: Session, wishlist_id: int, current_user: schemas.User
+) -> str:
+    # Ids only grow, so a change set always moves the count or the max id; edits
+    # are caught by the newest history row of this wishlist's comments. Access
+    # is checked in the same query.
+    latest_history = (
+        db.query(func.max(models.History.id))
+        .join(models.Comment, models.Comment.id == models.History.comment_id)
+        .filter(models.Comment.wishlist_id == wishlist_id)
+        .scalar_subquery()
+    )
+    version_row = (
+        db.query(
+            access_condition(current_user, owner_only=False),
+            func.count(models.Comment.id),
+            func.max(models.Comment.id),
+            latest_history,
+        )
+        .select_from(models.Wishlist)
+        .outerjoin(models.Comment, models.Comment.wishlist_id == models.Wishlist.id)
+        .filter(models.Wishlist.id == wishlist_id)
+        .group_by(models.Wishlist.id)
+        .first()
+    )
+    if not version_row:
+        raise exceptions.DataDoesNotExistError
+    accessible, *versions = version_row
+    if not accessible:
+        raise exceptions.PermissionDeniedError
+    return ":".join(map(str, versions))
+
+
+def fetch_comments_page(
+    db: Session,
+    wishlist_id: int,
+    current_user: schemas.User,
+    limit: int,
+    cursor: str,
+) -> tuple[list[models.Comment], Optional[str]]:
+    wishlist = get_accessible_wishlist(db, wishlist_id, current_user, owner_only=False)
+    comments, has_more = pagination.keyset_page(
+        db.query(models.Comment).filter(models.Comment.wishlist_id == wishlist.id),
+        [models.Comment.id],
+        descending=False,
+        after=pagination.decode_cursor(cursor, "id:asc") if cursor else None,
+        limit=limit,
+    )
+    next_cursor = None
+    if has_more:
+        next_cursor = pagination.encode_cursor("id:asc", [comments[-1].id])
+    return comments, next_cursor
+
+
 def get_comment(
     db: Session,
     wishlist_id: int,
     comment_id: int,
     current_user: schemas.User,
 ) -> models.Comment:
-    wishlist = get_accessible_wishlist(db, wishlist_id, current_user)
+    wishlist = get_accessible_wishlist(db, wishlist_id, current_user, owner_only=False)
     comment = (
         db.query(models.Comment)
         .filter(
@@ -1,7 +1,9 @@
+from typing import Optional
+
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from onboarding_app import exceptions, models, schemas, utils
+from onboarding_app import database, exceptions, models, pagination, schemas, utils
 
 
 def get_user(db: Session, user_id: int) -> models.User:
@@ -18,14 +20,44 @@ def get_user_by_username(db: Session, username: str) -> models.User:
     return user
 
 
+def get_token_version(db: Session, user_id: int) -> int:
+    token_version = (
+        db.query(models.User.token_version).filter(models.User.id == user_id).scalar()
+    )
+    if token_version is None:
+        raise exceptions.DataDoesNotExistError
+    return token_version
+
+
 def get_users(db: Session, offset: int = 0, limit: int = 100) -> list[models.User]:
-    return db.query(models.User).offset(offset).limit(limit).all()
+    return (
+        db.query(models.User).order_by(models.User.id).offset(offset).limit(limit).all()
+    )
+
+
+def get_users_page(
+    db: Session, cursor: str, limit: int = 100
+) -> tuple[list[models.User], Optional[str]]:
+    users, has_more = pagination.keyset_page(
+        db.query(models.User),
+        [models.User.id],
+        descending=False,
+        after=pagination.decode_cursor(cursor, "id:asc") if cursor else None,
+        limit=limit,
+    )
+    next_cursor = None
+    if has_more:
+        next_cursor = pagination.encode_cursor("id:asc", [users[-1].id])
+    return users, next_cursor
 
 
 def create_user(
-    db: Session, user: schemas.UserCreate, is_admin: bool = False
+    db: Session,
+    user: schemas.UserCreate,
+    hashed_password: str,
+    is_admin: bool = False,
 ) -> models.User:
-    hashed_password = utils.get_password_hash(user.password1)
+    # The caller hashes: this runs on the event loop thread in async mode.
     try:
         db_user = models.User(
             username=user.username,
@@ -41,8 +73,17 @@ def create_user(
 
 
 # OAuth2
-def authenticate_user(username: str, password: str, db: Session) -> models.User:
+def _get_user_for_login(db: Session, username: str) -> models.User:
     user = get_user_by_username(db, username)
-    if not user or not utils.verify_password(password, user.hashed_password):
+    # Hand the connection back to the pool while bcrypt runs.
+    db.close()
+    return user
+
+
+async def authenticate_user(username: str, password: str, db: Session) -> models.User:
+    user = await database.run(db, _get_user_for_login, username)
+    if not user or not await utils.verify_password_async(
+        password, user.hashed_password
+    ):
         raise exceptions.CredentialsError
     return user
@@ -1,40 +1,106 @@
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Optional
 
+from fastapi import BackgroundTasks
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import text
+from sqlalchemy import BigInteger, case, cast, func, Numeric, or_, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.engine import Row
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Query, Session
+from sqlalchemy.orm.attributes import set_committed_value
 
-from onboarding_app import exceptions, models, schemas, utils
+from onboarding_app import exceptions, models, ordering, pagination, schemas, versioning
+from onboarding_app.cache import TTLCache, VersionedCache
+from onboarding_app.config import settings
+
+# Serialized get_wishlist / fetch_stock_in_wishlist results, keyed by version.
+wishlist_cache = VersionedCache(
+    TTLCache(
+        maxsize=settings.WISHLIST_CACHE_MAXSIZE,
+        ttl=settings.WISHLIST_CACHE_TTL_SECONDS,
+    )
+)
+
+
+def access_condition(current_user: schemas.User, owner_only: bool):
+    is_owner = models.Wishlist.user_id == current_user.id
+    return is_owner if owner_only else or_(is_owner, models.Wishlist.is_open)
+
+
+def get_accessible_wishlist(
+    db: Session,
+    wishlist_id: int,
+    current_user: schemas.User,
+    owner_only: bool = True,
+    with_position: bool = False,
+) -> models.Wishlist:
+    """Load a wishlist and check access to it in a single statement.
+
+    Only the owner has access, unless ``owner_only`` is False and the wishlist is
+    open. The loaded wishlist is returned so callers don't query it again; pass
+    ``with_position`` when its order_num is going to be read.
+    """
+    accessible = access_condition(current_user, owner_only)
+    position_options = ordering.position_options(models.Wishlist)
+    wishlist_row = (
+        db.query(models.Wishlist, accessible.label("accessible"))
+        .options(*(position_options if with_position else ()))
+        .filter(models.Wishlist.id == wishlist_id)
+        .first()
+    )
+    if not wishlist_row:
+        raise exceptions.DataDoesNotExistError
+    wishlist, is_accessible = wishlist_row
+    if not is_accessible:
+        raise exceptions.PermissionDeniedError
+    return wishlist
 
 
-def validate_accessible_wishlist(wishlist_query_res: Query, current_user: schemas.User):
-    if not wishlist_query_res.first():
+def _get_cache_stamp(
+    db: Session,
+    wishlist_id: int,
+    current_user: schemas.User,
+    owner_only: bool = True,
+    epochs: tuple = (),
+) -> str:
+    """The version part of a cache key, checked for access like the row itself.
+
+    Reads only a few columns, so a cache hit costs one index lookup.
+    """
+    stamp_row = (
+        db.query(
+            access_condition(current_user, owner_only).label("accessible"),
+            models.Wishlist.version,
+            *map(versioning.epoch, epochs),
+        )
+        .filter(models.Wishlist.id == wishlist_id)
+        .first()
+    )
+    if not stamp_row:
         raise exceptions.DataDoesNotExistError
-    elif wishlist_query_res.first().user_id != current_user.id:
+    is_accessible, *versions = stamp_row
+    if not is_accessible:
         raise exceptions.PermissionDeniedError
+    return ":".join(map(str, versions))
 
 
 def create_wishlist(
     db: Session, current_user: schemas.User, wishlist: schemas.WishlistCreate
 ) -> models.Wishlist:
     try:
-        count_for_order = (
-            db.query(models.Wishlist)
-            .filter(models.Wishlist.user_id == current_user.id)
-            .count()
-        )
         created_wishlist = models.Wishlist(
             user_id=current_user.id,
             name=wishlist.name,
             description=wishlist.description,
-            order_num=count_for_order,
         )
+        ordering.append(db, created_wishlist, models.Wishlist.user_id)
         db.add(created_wishlist)
         db.commit()
     except IntegrityError:
         raise exceptions.DuplicatedError
-    return get_wishlist(db, created_wishlist.id, current_user)
+    return created_wishlist
 
 
 def fetch_wishlists(
@@ -46,31 +112,104 @@ def fetch_wishlists(
     offset: int,
 ) -> list[models.Wishlist]:
 
-    return (
-        db.query(models.Wishlist)
+    # The filter selects the user's whole list, so the window numbers every
+    # wishlist before the page is cut.
+    position = (
+        func.row_number().over(order_by=(models.Wishlist.order_key, models.Wishlist.id))
+        - 1
+    )
+    wishlist_rows = (
+        db.query(models.Wishlist, position.label("position"))
         .filter(models.Wishlist.user_id == current_user.id)
-        .order_by(text(f"{sort} {order_by}"))
+        .order_by(text(f"{sort} {order_by}"), models.Wishlist.id)
         .limit(limit)
         .offset(offset)
         .all()
     )
+    for db_wishlist, order_num in wishlist_rows:
+        set_committed_value(db_wishlist, "order_num", order_num)
+    return [db_wishlist for db_wishlist, _ in wishlist_rows]
 
 
-def get_wishlist(
+def fetch_wishlists_page(
+    db: Session,
+    current_user: schemas.User,
+    sort: str,
+    order_by: str,
+    limit: int,
+    cursor: str,
+) -> tuple[list[models.Wishlist], Optional[str]]:
+    # A window over the filtered rows would only number the page, so in sparse
+    # mode positions come from the per-row order_num column_property instead.
+    key = f"{sort}:{order_by}"
+    columns = [getattr(models.Wishlist, sort), models.Wishlist.id]
+    db_wishlists, has_more = pagination.keyset_page(
+        db.query(models.Wishlist)
+        .options(*ordering.position_options(models.Wishlist))
+        .filter(models.Wishlist.user_id == current_user.id),
+        columns,
+        descending=order_by == "desc",
+        after=pagination.decode_cursor(cursor, key) if cursor else None,
+        limit=limit,
+    )
+    next_cursor = None
+    if has_more:
+        last = db_wishlists[-1]
+        next_cursor = pagination.encode_cursor(key, [getattr(last, sort), last.id])
+    return db_wishlists, next_cursor
+
+
+def get_wishlists_version(db: Session, current_user: schemas.User) -> str:
+    # Field changes bump a wishlist's version and position changes the user's
+    # list epoch, so the (id, version) pairs and the epoch identify the whole
+    # list without loading it.
+    wishlist_versions = func.string_agg(
+        func.concat(models.Wishlist.id, ":", models.Wishlist.version),
+        aggregate_order_by(",", models.Wishlist.id),
+    )
+    return (
+        db.query(
+            func.concat(
+                func.coalesce(func.md5(wishlist_versions), ""),
+                ":",
+                versioning.epoch(versioning.user_wishlists(current_user.id)),
+            )
+        )
+        .filter(models.Wishlist.user_id == current_user.id)
+        .scalar()
+    )
+
+
+def get_wishlist_version(
     db: Session, wishlist_id: int, current_user: schemas.User
-) -> models.Wishlist:
-    wishlist_query_res = db.query(models.Wishlist).filter(
-        models.Wishlist.id == wishlist_id
+) -> str:
+    # order_num is the position among the owner's wishlists.
+    return _get_cache_stamp(
+        db,
+        wishlist_id,
+        current_user,
+        owner_only=False,
+        epochs=(versioning.user_wishlists(models.Wishlist.user_id),),
+    )
+
+
+def get_wishlist(
+    db: Session,
+    wishlist_id: int,
+    current_user: schemas.User,
+    version: Optional[str] = None,
+) -> dict:
+    """``version`` from get_wishlist_version, when the caller already has it."""
+    if version is None:
+        version = get_wishlist_version(db, wishlist_id, current_user)
+    return wishlist_cache.get_or_set(
+        f"wishlist:{wishlist_id}:{version}",
+        lambda: jsonable_encoder(
+            get_accessible_wishlist(
+                db, wishlist_id, current_user, owner_only=False, with_position=True
+            )
+        ),
     )
-    if not wishlist_query_res.first():
-        raise exceptions.DataDoesNotExistError
-    elif (
-        wishlist_query_res.first().is_open
-        or wishlist_query_res.first().user_id == current_user.id
-    ):
-        return wishlist_query_res.first()
-    else:
-        raise exceptions.PermissionDeniedError
 
 
 def update_wishlist(
@@ -79,41 +218,30 @@ def update_wishlist(
     current_user: schemas.User,
     wishlist: schemas.WishlistUpdate,
 ) -> models.Wishlist:
-    wishlist_query_res = db.query(models.Wishlist).filter(
-        models.Wishlist.id == wishlist_id
+    db_wishlist = get_accessible_wishlist(
+        db, wishlist_id, current_user, with_position=True
     )
-    validate_accessible_wishlist(wishlist_query_res, current_user)
     try:
-        wishlist_query_res.update(wishlist.dict(exclude_unset=True))
-        wishlist_query_res.first().updated_at = datetime.utcnow()
+        for field, value in wishlist.dict(exclude_unset=True).items():
+            setattr(db_wishlist, field, value)
+        db_wishlist.updated_at = datetime.now(timezone.utc)
+        db_wishlist.version = models.Wishlist.version + 1
         db.commit()
     except IntegrityError:
         raise exceptions.DuplicatedError
-    return wishlist_query_res.first()
+    return db_wishlist
 
 
 def delete_wishlist(
     db: Session, wishlist_id: int, current_user: schemas.User
 ) -> models.Wishlist:
-    wishlist_query_res = db.query(models.Wishlist).filter(
-        models.Wishlist.id == wishlist_id
-    )
-    validate_accessible_wishlist(wishlist_query_res, current_user)
-    wishlist_query_res.delete()
-    db.commit()
-    _reorder_wishlist_order_num(db, current_user.id)
-    return wishlist_query_res.first()
-
-
-def _reorder_wishlist_order_num(db: Session, user_id: int):
-    users_wishlist_query_res = (
-        db.query(models.Wishlist)
-        .filter(models.Wishlist.user_id == user_id)
-        .order_by(models.Wishlist.order_num)
-    )
-    for i, wishlist in enumerate(users_wishlist_query_res):
-        wishlist.order_num = i
+    db_wishlist = get_accessible_wishlist(db, wishlist_id, current_user)
+    db.delete(db_wishlist)
+    ordering.close_gap(db, models.Wishlist.user_id, current_user.id)
+    # Later siblings move up a position.
+    versioning.bump_epoch(db, versioning.user_wishlists(current_user.id))
     db.commit()
+    return None
 
 
 def change_wishlist_order(
@@ -121,41 +249,80 @@ def change_wishlist_order(
     current_user: schemas.User,
     wishlist_id: int,
     hope_order: int,
+    background_tasks: Optional[BackgroundTasks] = None,
 ) -> models.Wishlist:
-    wishlist_query_res = db.query(models.Wishlist).filter(
-        models.Wishlist.id == wishlist_id
+    db_wishlist = get_accessible_wishlist(db, wishlist_id, current_user)
+    ordering.move(
+        db, db_wishlist, models.Wishlist.user_id, hope_order, background_tasks
     )
-    wishlistList_query_res_by_foreign_key = db.query(models.Wishlist).filter(
-        models.Wishlist.user_id == current_user.id
+    versioning.bump_epoch(db, versioning.user_wishlists(current_user.id))
+    db.commit()
+    return db_wishlist
+
+
+def reorder_wishlists(
+    db: Session, current_user: schemas.User, wishlist_ids: list[int]
+) -> list[models.Wishlist]:
+    ordering.reorder_all(
+        db, models.Wishlist.user_id, current_user.id, models.Wishlist.id, wishlist_ids
     )
+    versioning.bump_epoch(db, versioning.user_wishlists(current_user.id))
+    db.commit()
+    db_wishlists = (
+        db.query(models.Wishlist)
+        .filter(models.Wishlist.user_id == current_user.id)
+        .order_by(models.Wishlist.order_key, models.Wishlist.id)
+        .all()
+    )
+    # The whole list comes back in order, so positions need no count.
+    for order_num, db_wishlist in enumerate(db_wishlists):
+        set_committed_value(db_wishlist, "order_num", order_num)
+    return db_wishlists
 
-    validate_accessible_wishlist(wishlist_query_res, current_user)
 
-    utils.reorder(
-        target_model_obj=wishlist_query_res.first(),
-        hope_order=hope_order,
-        modelList_query_res_by_foreign_key=wishlistList_query_res_by_foreign_key,
+def _query_wishstock_rows(db: Session, wishlist_id: int, order_num) -> Query:
+    return_rate = func.round(
+        cast(models.Stock.price - models.WishlistXstock.purchase_price, Numeric)
+        * 100
+        / func.nullif(models.WishlistXstock.purchase_price, 0),
+        2,
+    )
+    return (
+        db.query(
+            models.WishlistXstock,
+            models.Stock,
+            func.coalesce(return_rate, 0).label("return_rate"),
+            order_num.label("order_num"),
+        )
+        .join(models.Stock, models.Stock.id == models.WishlistXstock.stock_id)
+        .filter(models.WishlistXstock.wishlist_id == wishlist_id)
     )
 
-    db.commit()
-    return wishlist_query_res.first()
 
+def _fetch_wishstock_rows(db: Session, wishlist_id: int) -> Query:
+    # Numbering the whole list in one pass beats a position subquery per row.
+    order = (models.WishlistXstock.order_key, models.WishlistXstock.id)
+    position = func.row_number().over(order_by=order) - 1
+    return _query_wishstock_rows(db, wishlist_id, position).order_by(*order)
 
-def _get_wishstock_response(
-    db_wishstock: schemas.WishStock,
-    db_stock: schemas.Stock,
-) -> schemas.WishStockResponse:
 
-    return_rate = round(
-        (db_stock.price - db_wishstock.purchase_price)
-        / db_wishstock.purchase_price
-        * 100,
-        2,
+def _get_wishstock_row(db: Session, wishlist_id: int, stock_id: int) -> Row:
+    wishstock_row = (
+        _query_wishstock_rows(db, wishlist_id, ordering.position(models.WishlistXstock))
+        .filter(models.WishlistXstock.stock_id == stock_id)
+        .first()
     )
+    if not wishstock_row:
+        raise exceptions.DataDoesNotExistError
+    return wishstock_row
+
+
+def _get_wishstock_response(wishstock_row: Row) -> schemas.WishStockResponse:
+    db_wishstock, db_stock, return_rate, order_num = wishstock_row
 
     return schemas.WishStockResponse(
         stock=jsonable_encoder(db_stock),
-        order_num=db_wishstock.order_num,
+        order_num=order_num,
         purchase_price=db_wishstock.purchase_price,
         holding_num=db_wishstock.holding_num,
         return_rate=return_rate,
@@ -169,10 +336,7 @@ def add_stock_to_wishlist(
     wishstock: schemas.WishStockCreate,
 ) -> schemas.WishStockResponse:
 
-    wishlist_query_res = db.query(models.Wishlist).filter(
-        models.Wishlist.id == wishlist_id
-    )
-    validate_accessible_wishlist(wishlist_query_res, current_user)
+    get_accessible_wishlist(db, wishlist_id, current_user)
 
     db_stock = (
         db.query(models.Stock).filter(models.Stock.id == wishstock.stock_id).first()
@@ -180,59 +344,118 @@ def add_stock_to_wishlist(
     if not db_stock:
         raise exceptions.StockNotFoundError
 
-    count_for_order = (
-        db.query(models.WishlistXstock)
-        .filter(models.WishlistXstock.wishlist_id == wishlist_id)
-        .count()
-    )
-
     try:
         created_wishstock = models.WishlistXstock(
             wishlist_id=wishlist_id,
             stock_id=db_stock.id,
             purchase_price=wishstock.purchase_price,
             holding_num=wishstock.holding_num,
-            order_num=count_for_order,
         )
+        ordering.append(db, created_wishstock, models.WishlistXstock.wishlist_id)
         db.add(created_wishstock)
+        versioning.bump_wishlist_versions(db, models.Wishlist.id == wishlist_id)
         db.commit()
     except ZeroDivisionError:
         raise exceptions.InvalidQueryError
     except IntegrityError:
         raise exceptions.DuplicatedError
 
-    return _get_wishstock_response(created_wishstock, db_stock)
+    return _get_wishstock_response(_get_wishstock_row(db, wishlist_id, db_stock.id))
+
+
+def get_wishstocks_version(
+    db: Session, current_user: schemas.User, wishlist_id: int
+) -> str:
+    return _get_cache_stamp(
+        db, wishlist_id, current_user, epochs=(versioning.STOCK_PRICES,)
+    )
 
 
 def fetch_stock_in_wishlist(
     db: Session,
     current_user: schemas.User,
     wishlist_id: int,
-) -> list[schemas.WishStockResponse]:
+    version: Optional[str] = None,
+) -> list[dict]:
+
+    if version is None:
+        version = get_wishstocks_version(db, current_user, wishlist_id)
+    return wishlist_cache.get_or_set(
+        f"wishlist_stocks:{wishlist_id}:{version}",
+        lambda: [
+            jsonable_encoder(_get_wishstock_response(wishstock_row))
+            for wishstock_row in _fetch_wishstock_rows(db, wishlist_id)
+        ],
+    )
+
 
-    wishlist_query_res = db.query(models.Wishlist).filter(
-        models.Wishlist.id == wishlist_id
+def get_wishlist_summary(
+    db: Session, current_user: schemas.User, wishlist_id: int
+) -> schemas.PortfolioSummary:
+    get_accessible_wishlist(db, wishlist_id, current_user)
+    return _summarize(
+        _query_market_totals(db).filter(
+            models.WishlistXstock.wishlist_id == wishlist_id
+        )
     )
-    validate_accessible_wishlist(wishlist_query_res, current_user)
 
-    wishstocks_query_res = (
-        db.query(models.WishlistXstock)
-        .filter(models.WishlistXstock.wishlist_id == wishlist_id)
-        .order_by(models.WishlistXstock.order_num)
-        .all()
+
+def get_user_summary(
+    db: Session, current_user: schemas.User
+) -> schemas.PortfolioSummary:
+    return _summarize(
+        _query_market_totals(db)
+        .join(models.Wishlist, models.Wishlist.id == models.WishlistXstock.wishlist_id)
+        .filter(models.Wishlist.user_id == current_user.id)
+    )
+
+
+def _query_market_totals(db: Session) -> Query:
+    # bigint before multiplying: price * holding_num overflows int4 quickly.
+    holding_num = func.coalesce(models.WishlistXstock.holding_num, 0)
+    cost = cast(func.coalesce(models.WishlistXstock.purchase_price, 0), BigInteger)
+    value = cast(models.Stock.price, BigInteger)
+    return (
+        db.query(
+            models.Stock.market,
+            func.count().label("position_count"),
+            func.coalesce(func.sum(cost * holding_num), 0).label("total_cost"),
+            func.coalesce(func.sum(value * holding_num), 0).label("market_value"),
+        )
+        .join(models.Stock, models.Stock.id == models.WishlistXstock.stock_id)
+        .group_by(models.Stock.market)
+        .order_by(models.Stock.market)
     )
 
-    wishstocks = []
-    for db_wishstock in wishstocks_query_res:
-        db_stock = (
-            db.query(models.Stock)
-            .filter(models.Stock.id == db_wishstock.stock_id)
-            .first()
+
+def _summarize(market_rows: Query) -> schemas.PortfolioSummary:
+    markets = [
+        dict(
+            market=market,
+            position_count=position_count,
+            total_cost=int(total_cost),
+            market_value=int(market_value),
+            profit_loss=int(market_value - total_cost),
         )
+        for market, position_count, total_cost, market_value in market_rows
+    ]
+    total_cost = sum(market["total_cost"] for market in markets)
+    market_value = sum(market["market_value"] for market in markets)
+    for market in markets:
+        market["exposure"] = _percent(market["market_value"], market_value)
+    return schemas.PortfolioSummary(
+        position_count=sum(market["position_count"] for market in markets),
+        total_cost=total_cost,
+        market_value=market_value,
+        profit_loss=market_value - total_cost,
+        # Cost-weighted average of the per-position return rates.
+        return_rate=_percent(market_value - total_cost, total_cost),
+        markets=markets,
+    )
 
-        wishstocks.append(_get_wishstock_response(db_wishstock, db_stock))
 
-    return wishstocks
+def _percent(part: int, whole: int) -> float:
+    return round(part * 100 / whole, 2) if whole else 0.0
 
 
 def get_stock_in_wishlist(
@@ -242,23 +465,9 @@ def get_stock_in_wishlist(
     stock_id: int,
 ) -> schemas.WishStockResponse:
 
-    wishlist_query_res = db.query(models.Wishlist).filter(
-        models.Wishlist.id == wishlist_id
-    )
-    validate_accessible_wishlist(wishlist_query_res, current_user)
-
-    wishstock_query_res = db.query(models.WishlistXstock).filter(
-        models.WishlistXstock.wishlist_id == wishlist_id,
-        models.WishlistXstock.stock_id == stock_id,
-    )
-
-    if not wishstock_query_res.first():
-        raise exceptions.DataDoesNotExistError
+    get_accessible_wishlist(db, wishlist_id, current_user)
 
-    db_wishstock = wishstock_query_res.first()
-    db_stock = db.query(models.Stock).filter(models.Stock.id == stock_id).first()
-
-    return _get_wishstock_response(db_wishstock, db_stock)
+    return _get_wishstock_response(_get_wishstock_row(db, wishlist_id, stock_id))
 
 
 def update_stock_in_wishlist(
@@ -269,26 +478,21 @@ def update_stock_in_wishlist(
     wishstock: schemas.WishStockUpdate,
 ) -> schemas.WishStockResponse:
 
-    wishlist_query_res = db.query(models.Wishlist).filter(
-        models.Wishlist.id == wishlist_id
-    )
-    validate_accessible_wishlist(wishlist_query_res, current_user)
+    get_accessible_wishlist(db, wishlist_id, current_user)
 
     wishstock_query_res = db.query(models.WishlistXstock).filter(
         models.WishlistXstock.wishlist_id == wishlist_id,
         models.WishlistXstock.stock_id == stock_id,
     )
 
-    if not wishstock_query_res.first():
-        raise exceptions.DataDoesNotExistError
-
-    wishstock_query_res.update(wishstock.dict(exclude_unset=True))
-    db.commit()
-
-    db_wishstock = wishstock_query_res.first()
-    db_stock = db.query(models.Stock).filter(models.Stock.id == stock_id).first()
+    wishstock_update = wishstock.dict(exclude_unset=True)
+    if wishstock_update:
+        if not wishstock_query_res.update(wishstock_update):
+            raise exceptions.DataDoesNotExistError
+        versioning.bump_wishlist_versions(db, models.Wishlist.id == wishlist_id)
+        db.commit()
 
-    return _get_wishstock_response(db_wishstock, db_stock)
+    return _get_wishstock_response(_get_wishstock_row(db, wishlist_id, stock_id))
 
 
 def delete_stock_in_wishlist(
@@ -298,65 +502,232 @@ def delete_stock_in_wishlist(
     stock_id: int,
 ) -> None:
 
-    wishlist_query_res = db.query(models.Wishlist).filter(
-        models.Wishlist.id == wishlist_id
-    )
-    validate_accessible_wishlist(wishlist_query_res, current_user)
+    get_accessible_wishlist(db, wishlist_id, current_user)
 
     wishstock_query_res = db.query(models.WishlistXstock).filter(
         models.WishlistXstock.wishlist_id == wishlist_id,
         models.WishlistXstock.stock_id == stock_id,
     )
 
-    if not wishstock_query_res.first():
+    if not wishstock_query_res.delete():
         raise exceptions.DataDoesNotExistError
-
-    wishstock_query_res.delete()
+    ordering.close_gap(db, models.WishlistXstock.wishlist_id, wishlist_id)
+    versioning.bump_wishlist_versions(db, models.Wishlist.id == wishlist_id)
     db.commit()
-    _reorder_wishstock_for_delete(db, wishlist_id)
 
     return None
 
 
-def _reorder_wishstock_for_delete(db: Session, wishlist_id: int):
-    users_wishlist_query_res = (
-        db.query(models.WishlistXstock)
-        .filter(models.WishlistXstock.wishlist_id == wishlist_id)
-        .order_by(models.WishlistXstock.order_num)
-    )
-    for i, wishstock in enumerate(users_wishlist_query_res):
-        wishstock.order_num = i
-    db.commit()
-
-
 def change_stock_order(
     db: Session,
     current_user: schemas.User,
     wishlist_id: int,
     stock_id: int,
     hope_order: int,
+    background_tasks: Optional[BackgroundTasks] = None,
 ) -> schemas.WishStockResponse:
-    wishlist_query_res = db.query(models.Wishlist).filter(
-        models.Wishlist.id == wishlist_id
+    get_accessible_wishlist(db, wishlist_id, current_user)
+
+    db_wishstock = (
+        db.query(models.WishlistXstock)
+        .filter(
+            models.WishlistXstock.wishlist_id == wishlist_id,
+            models.WishlistXstock.stock_id == stock_id,
+        )
+        .first()
     )
-    validate_accessible_wishlist(wishlist_query_res, current_user)
+    if not db_wishstock:
+        raise exceptions.DataDoesNotExistError
 
-    wishstockList_query_res_by_foreign_key = db.query(models.WishlistXstock).filter(
-        models.WishlistXstock.wishlist_id == wishlist_id
+    ordering.move(
+        db,
+        db_wishstock,
+        models.WishlistXstock.wishlist_id,
+        hope_order,
+        background_tasks,
     )
+    versioning.bump_wishlist_versions(db, models.Wishlist.id == wishlist_id)
+    db.commit()
+
+    return _get_wishstock_response(_get_wishstock_row(db, wishlist_id, stock_id))
 
-    wishstock_query_res = wishstockList_query_res_by_foreign_key.filter(
-        models.WishlistXstock.stock_id == stock_id
+
+def reorder_stocks_in_wishlist(
+    db: Session, current_user: schemas.User, wishlist_id: int, stock_ids: list[int]
+) -> list[schemas.WishStockResponse]:
+    get_accessible_wishlist(db, wishlist_id, current_user)
+
+    ordering.reorder_all(
+        db,
+        models.WishlistXstock.wishlist_id,
+        wishlist_id,
+        models.WishlistXstock.stock_id,
+        stock_ids,
     )
+    versioning.bump_wishlist_versions(db, models.Wishlist.id == wishlist_id)
+    db.commit()
+
+    return [
+        _get_wishstock_response(wishstock_row)
+        for wishstock_row in _fetch_wishstock_rows(db, wishlist_id)
+    ]
+
+
+class _StockBatch:
+    """Folds a batch of stock operations into one DELETE, UPDATE and INSERT."""
+
+    def __init__(self, existing_stock_ids: set[int], known_stock_ids: set[int]):
+        self.existing_stock_ids = existing_stock_ids
+        self.known_stock_ids = known_stock_ids
+        self.removed: set[int] = set()
+        self.updated: dict[int, dict] = {}
+        self.added: dict[int, dict] = {}
+
+    def apply(self, operation: schemas.WishStockOperation) -> str:
+        values = operation.dict(
+            include={"purchase_price", "holding_num"}, exclude_unset=True
+        )
+        stock_id = operation.stock_id
+        is_present = stock_id in self.added or (
+            stock_id in self.existing_stock_ids and stock_id not in self.removed
+        )
 
-    utils.reorder(
-        target_model_obj=wishstock_query_res.first(),
-        hope_order=hope_order,
-        modelList_query_res_by_foreign_key=wishstockList_query_res_by_foreign_key,
+        if operation.op == "add":
+            if stock_id not in self.known_stock_ids:
+                return "stock_not_found"
+            if is_present:
+                return "duplicated"
+            if None in (operation.purchase_price, operation.holding_num):
+                return "invalid"
+            self.added[stock_id] = values
+        elif not is_present:
+            return "not_found"
+        elif operation.op == "update":
+            pending = self.added if stock_id in self.added else self.updated
+            pending.setdefault(stock_id, {}).update(values)
+        elif stock_id in self.added:
+            del self.added[stock_id]
+        else:
+            self.removed.add(stock_id)
+            self.updated.pop(stock_id, None)
+        return "ok"
+
+
+def apply_stock_batch(
+    db: Session,
+    current_user: schemas.User,
+    wishlist_id: int,
+    operations: list[schemas.WishStockOperation],
+) -> schemas.WishStockBatchResponse:
+    get_accessible_wishlist(db, wishlist_id, current_user)
+
+    current_keys = dict(
+        db.query(models.WishlistXstock.stock_id, models.WishlistXstock.order_key)
+        .filter(models.WishlistXstock.wishlist_id == wishlist_id)
+        .all()
+    )
+    requested_stock_ids = {
+        operation.stock_id for operation in operations if operation.op == "add"
+    }
+    known_stock_ids = set()
+    if requested_stock_ids:
+        known_stock_ids = {
+            stock_id
+            for (stock_id,) in db.query(models.Stock.id).filter(
+                models.Stock.id.in_(sorted(requested_stock_ids))
+            )
+        }
+
+    batch = _StockBatch(set(current_keys), known_stock_ids)
+    results = [
+        schemas.WishStockOperationResult(
+            op=operation.op, stock_id=operation.stock_id, status=batch.apply(operation)
+        )
+        for operation in operations
+    ]
+
+    wishstocks = db.query(models.WishlistXstock).filter(
+        models.WishlistXstock.wishlist_id == wishlist_id
     )
+    if batch.removed:
+        wishstocks.filter(
+            models.WishlistXstock.stock_id.in_(sorted(batch.removed))
+        ).delete(synchronize_session=False)
+    if batch.updated:
+        _update_wishstocks(wishstocks, batch.updated)
+    if batch.added:
+        surviving_keys = [
+            order_key
+            for stock_id, order_key in current_keys.items()
+            if stock_id not in batch.removed
+        ]
+        order_keys = ordering.keys_after(
+            max(surviving_keys, default=None), len(batch.added)
+        )
+        inserted_stock_ids = _insert_wishstocks(
+            db, wishlist_id, batch.added, order_keys
+        )
+        # Rows added concurrently since current_keys was read lose the race.
+        for result in results:
+            if (
+                result.op == "add"
+                and result.status == "ok"
+                and result.stock_id in batch.added
+                and result.stock_id not in inserted_stock_ids
+            ):
+                result.status = "duplicated"
+    if batch.removed:
+        ordering.close_gap(db, models.WishlistXstock.wishlist_id, wishlist_id)
+    versioning.bump_wishlist_versions(db, models.Wishlist.id == wishlist_id)
     db.commit()
 
-    db_wishstock = wishstock_query_res.first()
-    db_stock = db.query(models.Stock).filter(models.Stock.id == stock_id).first()
+    return schemas.WishStockBatchResponse(
+        results=results,
+        stocks=[
+            _get_wishstock_response(wishstock_row)
+            for wishstock_row in _fetch_wishstock_rows(db, wishlist_id)
+        ],
+    )
 
-    return _get_wishstock_response(db_wishstock, db_stock)
+
+def _update_wishstocks(wishstocks: Query, updated: dict[int, dict]):
+    values = {}
+    for column in (
+        models.WishlistXstock.purchase_price,
+        models.WishlistXstock.holding_num,
+    ):
+        new_values = {
+            stock_id: row_values[column.key]
+            for stock_id, row_values in updated.items()
+            if column.key in row_values
+        }
+        if new_values:
+            values[column] = case(
+                new_values, value=models.WishlistXstock.stock_id, else_=column
+            )
+    if values:
+        wishstocks.filter(models.WishlistXstock.stock_id.in_(list(updated))).update(
+            values, synchronize_session=False
+        )
+
+
+def _insert_wishstocks(
+    db: Session, wishlist_id: int, added: dict[int, dict], order_keys: list[int]
+) -> set[int]:
+    wishstock_table = models.WishlistXstock.__table__
+    rows = [
+        {
+            "wishlist_id": wishlist_id,
+            "stock_id": stock_id,
+            "order_num": order_key,
+            **row_values,
+        }
+        for (stock_id, row_values), order_key in zip(added.items(), order_keys)
+    ]
+    inserted = db.execute(
+        postgresql.insert(wishstock_table)
+        .values(rows)
+        .on_conflict_do_nothing(constraint="wishlist_id__stock_id_unique")
+        .returning(wishstock_table.c.stock_id)
+    )
+    return {stock_id for (stock_id,) in inserted}
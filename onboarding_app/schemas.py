@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, constr, EmailStr, validator
 
@@ -15,6 +15,22 @@ class User(BaseModel):
         orm_mode = True
 
 
+class UserPage(BaseModel):
+    items: list[User]
+    next_cursor: Optional[str]
+
+
+class Principal(BaseModel):
+    id: int
+    username: str
+    is_active: bool
+    is_admin: bool
+    token_version: int = 0
+
+    class Config:
+        orm_mode = True
+
+
 class UserCreate(BaseModel):
     username: constr(min_length=4, max_length=20)  # type:ignore
     email: EmailStr
@@ -70,6 +86,11 @@ class Wishlist(BaseModel):
         orm_mode = True
 
 
+class WishlistPage(BaseModel):
+    items: list[Wishlist]
+    next_cursor: Optional[str]
+
+
 class WishlistCreate(BaseModel):
     name: str
     description: str
@@ -80,6 +101,10 @@ class WishlistUpdate(BaseModel):
     description: Optional[str]
 
 
+class WishlistOrderUpdate(BaseModel):
+    wishlist_ids: list[int]
+
+
 class WishStock(BaseModel):
     id: int
     wishlist_id: int
@@ -103,6 +128,10 @@ class WishStockUpdate(BaseModel):
     holding_num: Optional[int]
 
 
+class WishStockOrderUpdate(BaseModel):
+    stock_ids: list[int]
+
+
 class WishStockResponse(BaseModel):
     stock: Stock
     order_num: int
@@ -111,6 +140,46 @@ class WishStockResponse(BaseModel):
     return_rate: float
 
 
+class WishStockOperation(BaseModel):
+    op: Literal["add", "update", "remove"]
+    stock_id: int
+    purchase_price: Optional[int]
+    holding_num: Optional[int]
+
+
+class WishStockBatch(BaseModel):
+    operations: list[WishStockOperation]
+
+
+class WishStockOperationResult(BaseModel):
+    op: str
+    stock_id: int
+    status: Literal["ok", "duplicated", "not_found", "stock_not_found", "invalid"]
+
+
+class WishStockBatchResponse(BaseModel):
+    results: list[WishStockOperationResult]
+    stocks: list[WishStockResponse]
+
+
+class MarketExposure(BaseModel):
+    market: str
+    position_count: int
+    total_cost: int
+    market_value: int
+    profit_loss: int
+    exposure: float
+
+
+class PortfolioSummary(BaseModel):
+    position_count: int
+    total_cost: int
+    market_value: int
+    profit_loss: int
+    return_rate: float
+    markets: list[MarketExposure]
+
+
 class History(BaseModel):
     content: str
     created_at: str
@@ -131,5 +200,22 @@ class Comment(BaseModel):
         orm_mode = True
 
 
+class CommentPage(BaseModel):
+    items: list[Comment]
+    next_cursor: Optional[str]
+
+
 class CommentCreate(BaseModel):
     content: str
+
+
+class PoolStatus(BaseModel):
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    checkouts: int
+    timeouts: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+    overflow_max: int
@@ -0,0 +1,122 @@
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+from functools import lru_cache
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Optional
+
+from starlette.types import Scope
+
+from onboarding_app.config import settings
+
+QUERY_MODULE_PREFIX = "onboarding_app.queries."
+_SAFE_PARAMETER_TYPES = (bool, int, float, type(None))
+
+
+def log_if_slow(
+    conn,
+    statement: str,
+    parameters: Any,
+    executemany: bool,
+    duration_seconds: float,
+    scope: Optional[Scope],
+):
+    """Write a JSONL entry, with its plan, for slow statements issued by queries/*.
+
+    Opt-in through SLOW_QUERY_LOG. Parameter values other than numbers, booleans
+    and NULL are redacted.
+    """
+    if not settings.SLOW_QUERY_LOG:
+        return
+    if duration_seconds * 1000 < settings.SLOW_QUERY_THRESHOLD_MS:
+        return
+    query_function = _find_query_function()
+    if query_function is None:
+        return
+
+    entry = {
+        "logged_at": datetime.now(timezone.utc).isoformat(),
+        "duration_ms": round(duration_seconds * 1000, 3),
+        "query_function": query_function,
+        "endpoint": _describe_endpoint(scope),
+        "statement": statement,
+        "parameters": _redact(parameters),
+        "plan": None if executemany else _explain(conn, statement, parameters),
+    }
+    _get_file_logger(
+        settings.SLOW_QUERY_LOG_PATH,
+        settings.SLOW_QUERY_LOG_MAX_BYTES,
+        settings.SLOW_QUERY_LOG_BACKUP_COUNT,
+    ).info(json.dumps(entry, ensure_ascii=False, default=str))
+
+
+def _find_query_function() -> Optional[str]:
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        name = frame.f_code.co_name
+        # Comprehensions and lambdas report the function they are defined in.
+        if module.startswith(QUERY_MODULE_PREFIX) and not name.startswith("<"):
+            return f"{module}.{name}"
+        frame = frame.f_back
+    return None
+
+
+def _describe_endpoint(scope: Optional[Scope]) -> Optional[str]:
+    if scope is None:
+        return None
+    endpoint = scope.get("endpoint")
+    description = f"{scope['method']} {scope['path']}"
+    if endpoint is not None:
+        description += f" ({endpoint.__module__}.{endpoint.__name__})"
+    return description
+
+
+def _redact(parameters: Any) -> Any:
+    if isinstance(parameters, dict):
+        return {key: _redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact(value) for value in parameters]
+    if isinstance(parameters, _SAFE_PARAMETER_TYPES):
+        return parameters
+    return f"<{type(parameters).__name__}>"
+
+
+def _explain(conn, statement: str, parameters: Any) -> Optional[list[str]]:
+    # Runs on a bare DBAPI cursor, so it neither re-enters the engine events nor
+    # counts towards the request. ANALYZE executes the statement again, which
+    # is only harmless for SELECTs; the savepoint keeps a failing EXPLAIN from
+    # aborting the caller's transaction.
+    if statement.lstrip().upper().startswith("SELECT"):
+        explain = "EXPLAIN (ANALYZE, BUFFERS) "
+    else:
+        explain = "EXPLAIN "
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute(explain + statement, parameters)
+            plan = [row[0] for row in cursor.fetchall()]
+        except Exception as exc:
+            cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            plan = [f"EXPLAIN failed: {exc}"]
+        cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        return plan
+    except Exception:
+        return None
+    finally:
+        cursor.close()
+
+
+@lru_cache(maxsize=None)
+def _get_file_logger(path: str, max_bytes: int, backup_count: int) -> logging.Logger:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    handler = RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    file_logger = logging.Logger(__name__)
+    file_logger.addHandler(handler)
+    return file_logger
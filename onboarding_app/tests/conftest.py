@@ -1,10 +1,10 @@
 import pytest
 from fastapi.testclient import TestClient
 
-from onboarding_app import schemas
-from onboarding_app.database import Base, engine, SessionLocal
+from onboarding_app import dependencies, schemas, utils
+from onboarding_app.database import Base, get_created_engines, get_engine, SessionLocal
 from onboarding_app.main import app
-from onboarding_app.queries import user as user_query
+from onboarding_app.queries import user as user_query, wishlist as wishlist_query
 from onboarding_app.tests.utils import obtain_token_reg
 
 
@@ -20,8 +20,18 @@ class TestClientWithAuth(TestClient):
 client = TestClientWithAuth(app)
 
 
+@pytest.fixture(scope="session", autouse=True)
+def client_event_loop():
+    # Keep one event loop for the whole run; without the context every request
+    # gets a fresh loop, and asyncpg connections pooled by the async engine
+    # only work on the loop that opened them.
+    with client:
+        yield
+
+
 @pytest.fixture
 def db_session():
+    get_engine()
     try:
         db = SessionLocal()
         yield db
@@ -31,10 +41,18 @@ def db_session():
 
 @pytest.fixture(autouse=True)
 def clear_db():
+    engine = get_engine()
     Base.metadata.create_all(bind=engine, checkfirst=True)
     yield
     Base.metadata.drop_all(bind=engine, checkfirst=False)
     engine.dispose()
+    async_engine = get_created_engines().get("async")
+    if async_engine is not None:
+        # Pooled asyncpg connections cache statements for the dropped tables.
+        client.portal.call(async_engine.dispose)
+    dependencies.principal_cache.clear()
+    dependencies.token_version_cache.clear()
+    wishlist_query.wishlist_cache.clear()
 
 
 @pytest.fixture(autouse=True)
@@ -60,6 +78,10 @@ def create_dumy_user(db_session):
         password2="reg2",
     )
 
-    user_query.create_user(db=db_session, user=admin, is_admin=True)
-    user_query.create_user(db=db_session, user=reg1)
-    user_query.create_user(db=db_session, user=reg2)
+    for user, is_admin in ((admin, True), (reg1, False), (reg2, False)):
+        user_query.create_user(
+            db=db_session,
+            user=user,
+            hashed_password=utils.get_password_hash(user.password1),
+            is_admin=is_admin,
+        )
@@ -7,7 +7,7 @@ from onboarding_app.queries import (
     wishlist as wishlist_query,
 )
 from onboarding_app.tests.conftest import client
-from onboarding_app.tests.utils import get_wishlist_by_name
+from onboarding_app.tests.utils import assert_max_queries, get_wishlist_by_name
 
 client.authenticate("reg1")
 
@@ -66,10 +66,11 @@ def test_to_create_comment(db_session):
     wishlist = get_wishlist_by_name(db=db_session, name="wishlist1", current_user=reg)
 
     # When
-    comment_response = client.post(
-        f"/wishlists/{wishlist.id}/comments",
-        json={"content": "content1"},
-    )
+    with assert_max_queries(4):
+        comment_response = client.post(
+            f"/wishlists/{wishlist.id}/comments",
+            json={"content": "content1"},
+        )
 
     # Then
     assert comment_response.status_code == 200
@@ -84,15 +85,81 @@ def test_to_fetch_comments(db_session):
     wishlist = get_wishlist_by_name(db=db_session, name="wishlist1", current_user=reg)
 
     # When
-    comment_fetch_response = client.get(
-        f"/wishlists/{wishlist.id}/comments",
-    )
+    with assert_max_queries(4):
+        comment_fetch_response = client.get(
+            f"/wishlists/{wishlist.id}/comments",
+        )
 
     # Then
     assert comment_fetch_response.status_code == 200
     assert len(comment_fetch_response.json()) == 10
 
 
+def test_to_fetch_comments_with_cursor(db_session):
+    # Given
+    reg = user_query.get_user_by_username(db=db_session, username="reg1")
+    wishlist = get_wishlist_by_name(db=db_session, name="wishlist1", current_user=reg)
+    comment_ids, cursor = [], ""
+
+    # When
+    while cursor is not None:
+        with assert_max_queries(4):
+            page_response = client.get(
+                f"/wishlists/{wishlist.id}/comments",
+                params={"limit": 6, "cursor": cursor},
+            )
+        comment_ids += [comment["id"] for comment in page_response.json()["items"]]
+        cursor = page_response.json()["next_cursor"]
+
+    # Then
+    assert len(comment_ids) == 20
+    assert comment_ids == sorted(comment_ids)
+
+
+def test_fetch_comments_etag_changes_with_edits(db_session):
+    # Given
+    reg = user_query.get_user_by_username(db=db_session, username="reg1")
+    wishlist = get_wishlist_by_name(db=db_session, name="wishlist1", current_user=reg)
+    url = f"/wishlists/{wishlist.id}/comments"
+    etag = client.get(url).headers["ETag"]
+
+    # When
+    with assert_max_queries(1):
+        unchanged = client.get(url, headers={"If-None-Match": f'W/{etag}, "other"'})
+    comment = client.get(url).json()[0]
+    client.put(f"{url}/{comment['id']}", json={"content": "edited"})
+    edited = client.get(url, headers={"If-None-Match": etag})
+
+    # Then
+    assert unchanged.status_code == 304
+    assert edited.status_code == 200
+    assert edited.headers["ETag"] != etag
+    assert edited.json()[0]["content"] == "edited"
+
+
+def test_fetch_comments_etag_ignores_other_wishlists(db_session):
+    # Given
+    reg = user_query.get_user_by_username(db=db_session, username="reg1")
+    wishlist = get_wishlist_by_name(db=db_session, name="wishlist1", current_user=reg)
+    other_wishlist = wishlist_query.create_wishlist(
+        db=db_session,
+        current_user=reg,
+        wishlist=schemas.WishlistCreate(name="wishlist2", description="wishlist2"),
+    )
+    other_url = f"/wishlists/{other_wishlist.id}/comments"
+    other_comment = client.post(other_url, json={"content": "other"}).json()
+    url = f"/wishlists/{wishlist.id}/comments"
+    etag = client.get(url).headers["ETag"]
+
+    # When
+    client.put(f"{other_url}/{other_comment['id']}", json={"content": "edited"})
+    client.post(other_url, json={"content": "another"})
+    unchanged = client.get(url, headers={"If-None-Match": etag})
+
+    # Then
+    assert unchanged.status_code == 304
+
+
 def test_to_get_comment(db_session):
     # Given
     reg = user_query.get_user_by_username(db=db_session, username="reg1")
@@ -104,9 +171,10 @@ def test_to_get_comment(db_session):
         .first()
     )
     # When
-    comment_get_response = client.get(
-        f"/wishlists/{wishlist1.id}/comments/{comment.id}",
-    )
+    with assert_max_queries(3):
+        comment_get_response = client.get(
+            f"/wishlists/{wishlist1.id}/comments/{comment.id}",
+        )
 
     # Then
     assert comment_get_response.status_code == 200
@@ -125,10 +193,11 @@ def test_to_update_comment(db_session):
     )
 
     # When
-    update_response = client.put(
-        f"/wishlists/{wishlist.id}/comments/{comment.id}",
-        json={"content": "updated"},
-    )
+    with assert_max_queries(5):
+        update_response = client.put(
+            f"/wishlists/{wishlist.id}/comments/{comment.id}",
+            json={"content": "updated"},
+        )
 
     # Then
     assert update_response.status_code == 200
@@ -173,10 +242,11 @@ def test_to_create_reply_to_comment(db_session):
     )
 
     # When
-    reply_response = client.post(
-        f"/wishlists/{wishlist.id}/comments/{comment.id}/replies",
-        json={"content": "reply"},
-    )
+    with assert_max_queries(4):
+        reply_response = client.post(
+            f"/wishlists/{wishlist.id}/comments/{comment.id}/replies",
+            json={"content": "reply"},
+        )
 
     # Then
     assert reply_response.status_code == 200
@@ -197,9 +267,10 @@ def test_to_fetch_replies(db_session):
     )
 
     # When
-    reply_fetch_response = client.get(
-        f"/wishlists/{wishlist.id}/comments/{comment.id}/replies",
-    )
+    with assert_max_queries(4):
+        reply_fetch_response = client.get(
+            f"/wishlists/{wishlist.id}/comments/{comment.id}/replies",
+        )
 
     # Then
     assert reply_fetch_response.status_code == 200
@@ -227,9 +298,10 @@ def test_to_fetch_history(db_session):
         )
 
     # When
-    history_fetch_response = client.get(
-        f"/wishlists/{wishlist.id}/comments/{comment.id}/history",
-    )
+    with assert_max_queries(6):
+        history_fetch_response = client.get(
+            f"/wishlists/{wishlist.id}/comments/{comment.id}/history",
+        )
 
     # Then
     assert history_fetch_response.status_code == 200
@@ -0,0 +1,28 @@
+from onboarding_app import schemas
+from onboarding_app.queries import user as user_query, wishlist as wishlist_query
+from onboarding_app.tests.conftest import client
+
+client.authenticate("reg1")
+
+
+def test_metrics_are_reported_per_route_template(db_session):
+    # Given
+    reg = user_query.get_user_by_username(db=db_session, username="reg1")
+    wishlist = wishlist_query.create_wishlist(
+        db=db_session,
+        current_user=reg,
+        wishlist=schemas.WishlistCreate(name="wishlist1", description="wishlist1"),
+    )
+    client.get(f"/wishlists/{wishlist.id}/stocks")
+
+    # When
+    metrics_response = client.get("/metrics")
+
+    # Then
+    assert metrics_response.status_code == 200
+    labels = 'method="GET",route="/wishlists/{wishlist_id}/stocks"'
+    assert f'http_requests_total{{{labels},status="200"}}' in metrics_response.text
+    assert f"http_request_duration_seconds_count{{{labels}}}" in metrics_response.text
+    assert f"db_statements_per_request_sum{{{labels}}}" in metrics_response.text
+    assert f"/wishlists/{wishlist.id}/stocks" not in metrics_response.text
+    assert 'db_pool_checked_out{pool="primary"}' in metrics_response.text
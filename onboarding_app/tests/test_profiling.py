@@ -0,0 +1,34 @@
+from onboarding_app import profiling
+from onboarding_app.config import settings
+from onboarding_app.tests.conftest import client
+from onboarding_app.tests.utils import obtain_token_admin
+
+
+def test_query_counts_are_sent_in_debug_mode(monkeypatch):
+    # Given
+    monkeypatch.setattr(settings, "DEBUG", True)
+    admin_token = obtain_token_admin()
+
+    # When
+    response = client.get(
+        "/users/me/", headers={"Authorization": "Bearer " + admin_token}
+    )
+
+    # Then
+    assert response.status_code == 200
+    assert int(response.headers["X-DB-Query-Count"]) == 2
+    assert float(response.headers["X-DB-Time-Ms"]) > 0
+
+
+def test_repeated_statements_are_reported():
+    # Given
+    stats = profiling.QueryStats()
+
+    # When
+    for _ in range(3):
+        stats.record("SELECT * FROM stocks WHERE id = %(id)s", 0.001)
+    stats.record("SELECT * FROM users", 0.001)
+
+    # Then
+    assert stats.count == 4
+    assert stats.repeated(3) == [("SELECT * FROM stocks WHERE id = %(id)s", 3)]
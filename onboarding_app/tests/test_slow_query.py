@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from onboarding_app import models, schemas
+from onboarding_app.config import settings
+from onboarding_app.queries import user as user_query, wishlist as wishlist_query
+from onboarding_app.tests.conftest import client
+
+client.authenticate("reg1")
+
+
+@pytest.fixture
+def wishlist(db_session):
+    reg = user_query.get_user_by_username(db=db_session, username="reg1")
+    stock = models.Stock(name="stock0", code="code0", price=1000, market="KOSPI")
+    db_session.add(stock)
+    db_session.commit()
+    db_wishlist = wishlist_query.create_wishlist(
+        db=db_session,
+        current_user=reg,
+        wishlist=schemas.WishlistCreate(name="wishlist1", description="wishlist1"),
+    )
+    wishlist_query.add_stock_to_wishlist(
+        db=db_session,
+        current_user=reg,
+        wishlist_id=db_wishlist.id,
+        wishstock=schemas.WishStockCreate(
+            stock_id=stock.id, purchase_price=12000, holding_num=10
+        ),
+    )
+    return db_wishlist
+
+
+def _parameter_values(entry: dict) -> list:
+    # psycopg2 binds by name; asyncpg (DB_ASYNC) binds positionally.
+    parameters = entry["parameters"]
+    return list(parameters.values() if isinstance(parameters, dict) else parameters)
+
+
+def test_slow_stock_queries_are_logged_with_plan(wishlist, monkeypatch, tmp_path):
+    # Given
+    log_path = tmp_path / "slow_queries.jsonl"
+    monkeypatch.setattr(settings, "SLOW_QUERY_LOG", True)
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0)
+    monkeypatch.setattr(settings, "SLOW_QUERY_LOG_PATH", str(log_path))
+
+    # When
+    stock_response = client.get(f"/wishlists/{wishlist.id}/stocks")
+
+    # Then
+    assert stock_response.status_code == 200
+    entries = [json.loads(line) for line in log_path.read_text().splitlines()]
+    fetch_entry = next(
+        entry
+        for entry in entries
+        if entry["query_function"]
+        == "onboarding_app.queries.wishlist.fetch_stock_in_wishlist"
+    )
+    assert fetch_entry["endpoint"] == (
+        f"GET /wishlists/{wishlist.id}/stocks "
+        "(onboarding_app.endpoints.wishlist.fetch_stock_in_wishlist)"
+    )
+    assert wishlist.id in _parameter_values(fetch_entry)
+    assert any("Buffers" in line or "Scan" in line for line in fetch_entry["plan"])
+    principal_entry = next(
+        entry
+        for entry in entries
+        if entry["query_function"] == "onboarding_app.queries.user.get_user_by_username"
+    )
+    assert "reg1" not in json.dumps(principal_entry["parameters"])
+    assert "<str>" in _parameter_values(principal_entry)
@@ -1,9 +1,14 @@
 import pytest
 
-from onboarding_app import models, schemas
+from onboarding_app import models, schemas, versioning
+from onboarding_app.cache import TTLCache
 from onboarding_app.queries import user as user_query, wishlist as wishlist_query
 from onboarding_app.tests.conftest import client
-from onboarding_app.tests.utils import get_wishlist_by_name
+from onboarding_app.tests.utils import (
+    assert_max_queries,
+    count_queries,
+    get_wishlist_by_name,
+)
 
 client.authenticate("reg1")
 
@@ -72,10 +77,11 @@ def test_add_stock_to_wishlist(db_session):
     stock = db_session.query(models.Stock).first()
 
     # When
-    stock_response = client.post(
-        f"/wishlists/{wishlist.id}/stocks",
-        json={"stock_id": stock.id, "purchase_price": 12332, "holding_num": 10},
-    )
+    with assert_max_queries(7):
+        stock_response = client.post(
+            f"/wishlists/{wishlist.id}/stocks",
+            json={"stock_id": stock.id, "purchase_price": 12332, "holding_num": 10},
+        )
 
     # Then
     assert stock_response.status_code == 200
@@ -110,13 +116,38 @@ def test_fetch_stock_in_wishlist(db_session):
     wishlist = get_wishlist_by_name(db=db_session, current_user=reg, name="wishlist1")
 
     # When
-    stock_response = client.get(
-        f"/wishlists/{wishlist.id}/stocks",
+    with assert_max_queries(3):
+        stock_response = client.get(
+            f"/wishlists/{wishlist.id}/stocks",
+        )
+
+    # Then
+    assert stock_response.status_code == 200
+    assert len(stock_response.json()) == 10
+
+
+def test_fetch_stock_in_wishlist_issues_constant_queries(db_session):
+    # Given
+    reg = user_query.get_user_by_username(db=db_session, username="reg1")
+    wishlist = get_wishlist_by_name(db=db_session, current_user=reg, name="wishlist1")
+    empty_wishlist = get_wishlist_by_name(
+        db=db_session, current_user=reg, name="nothing_in_wishlist"
     )
 
+    client.get("/users/me/")
+
+    # When
+    with count_queries() as empty_statements:
+        empty_response = client.get(f"/wishlists/{empty_wishlist.id}/stocks")
+    with count_queries() as statements:
+        stock_response = client.get(f"/wishlists/{wishlist.id}/stocks")
+
     # Then
+    assert empty_response.status_code == 200
     assert stock_response.status_code == 200
     assert len(stock_response.json()) == 10
+    assert stock_response.json()[0]["return_rate"] == -91.67
+    assert len(statements) == len(empty_statements)
 
 
 def test_get_stock_in_wishlist(db_session):
@@ -127,9 +158,10 @@ def test_get_stock_in_wishlist(db_session):
     stock = db_session.query(models.Stock).first()
 
     # When
-    stock_response = client.get(
-        f"/wishlists/{wishlist.id}/stocks/{stock.id}",
-    )
+    with assert_max_queries(3):
+        stock_response = client.get(
+            f"/wishlists/{wishlist.id}/stocks/{stock.id}",
+        )
 
     # Then
     assert stock_response.status_code == 200
@@ -144,10 +176,11 @@ def test_update_stock_in_wishlist(db_session):
     stock = db_session.query(models.Stock).first()
 
     # When
-    stock_response = client.put(
-        f"/wishlists/{wishlist.id}/stocks/{stock.id}",
-        json={"purchase_price": 120000, "holding_num": 100},
-    )
+    with assert_max_queries(5):
+        stock_response = client.put(
+            f"/wishlists/{wishlist.id}/stocks/{stock.id}",
+            json={"purchase_price": 120000, "holding_num": 100},
+        )
 
     # Then
     assert stock_response.status_code == 200
@@ -164,9 +197,10 @@ def test_delete_stock_in_wishlist(db_session):
     stock = db_session.query(models.Stock).first()
 
     # When
-    stock_response = client.delete(
-        f"/wishlists/{wishlist.id}/stocks/{stock.id}",
-    )
+    with assert_max_queries(5):
+        stock_response = client.delete(
+            f"/wishlists/{wishlist.id}/stocks/{stock.id}",
+        )
 
     # Then
     deleted_wishstock_query_res = db_session.query(models.WishlistXstock).filter(
@@ -204,10 +238,11 @@ def test_change_stock_order(db_session, origin_order: int, hope_order: int):
     )
 
     # When
-    stock_order_response = client.put(
-        f"/wishlists/{wishlist.id}/stocks/{target_wishstock.stock_id}/order",
-        params={"hope_order": hope_order},
-    )
+    with assert_max_queries(8):
+        stock_order_response = client.put(
+            f"/wishlists/{wishlist.id}/stocks/{target_wishstock.stock_id}/order",
+            params={"hope_order": hope_order},
+        )
 
     # Then
     assert stock_order_response.status_code == 200
@@ -231,3 +266,197 @@ def test_change_stock_order(db_session, origin_order: int, hope_order: int):
         else:
             gap = 1 if origin_order < hope_order else -1
             assert wishstock.stock_id == stocks[i].id + gap
+
+
+def test_reorder_stocks_in_wishlist_in_one_request(db_session):
+    # Given
+    reg = user_query.get_user_by_username(db=db_session, username="reg1")
+    wishlist = get_wishlist_by_name(db=db_session, current_user=reg, name="wishlist1")
+    stock_ids = [stock.id for stock in db_session.query(models.Stock).all()]
+    new_order = stock_ids[1::2] + stock_ids[::2]
+
+    # When
+    with assert_max_queries(6):
+        reorder_response = client.put(
+            f"/wishlists/{wishlist.id}/stocks/order", json={"stock_ids": new_order}
+        )
+    bad_reorder_response = client.put(
+        f"/wishlists/{wishlist.id}/stocks/order", json={"stock_ids": new_order[1:]}
+    )
+
+    # Then
+    assert reorder_response.status_code == 200
+    assert [wishstock["stock"]["id"] for wishstock in reorder_response.json()] == (
+        new_order
+    )
+    assert [wishstock["order_num"] for wishstock in reorder_response.json()] == list(
+        range(10)
+    )
+    assert bad_reorder_response.status_code == 400
+
+
+def test_apply_stock_batch_reports_each_operation(db_session):
+    # Given
+    reg = user_query.get_user_by_username(db=db_session, username="reg1")
+    wishlist = get_wishlist_by_name(
+        db=db_session, current_user=reg, name="nothing_in_wishlist"
+    )
+    stock_ids = [stock.id for stock in db_session.query(models.Stock).all()]
+    new_stock = {"purchase_price": 1000, "holding_num": 1}
+    operations = [
+        {"op": "add", "stock_id": stock_ids[0], **new_stock},
+        {"op": "add", "stock_id": stock_ids[1], **new_stock},
+        {"op": "add", "stock_id": stock_ids[2], **new_stock},
+        {"op": "add", "stock_id": stock_ids[0], **new_stock},
+        {"op": "add", "stock_id": max(stock_ids) + 1, **new_stock},
+        {"op": "add", "stock_id": stock_ids[3], "purchase_price": 1000},
+        {"op": "update", "stock_id": stock_ids[1], "holding_num": 7},
+        {"op": "remove", "stock_id": stock_ids[0]},
+        {"op": "update", "stock_id": stock_ids[4], "holding_num": 7},
+    ]
+
+    # When
+    with assert_max_queries(7):
+        batch_response = client.post(
+            f"/wishlists/{wishlist.id}/stocks/batch", json={"operations": operations}
+        )
+
+    # Then
+    assert batch_response.status_code == 200
+    assert [result["status"] for result in batch_response.json()["results"]] == [
+        "ok",
+        "ok",
+        "ok",
+        "duplicated",
+        "stock_not_found",
+        "invalid",
+        "ok",
+        "ok",
+        "not_found",
+    ]
+    assert [
+        (wishstock["stock"]["id"], wishstock["order_num"], wishstock["holding_num"])
+        for wishstock in batch_response.json()["stocks"]
+    ] == [(stock_ids[1], 0, 7), (stock_ids[2], 1, 1)]
+
+
+def test_apply_stock_batch_renumbers_once_after_removals(db_session):
+    # Given
+    reg = user_query.get_user_by_username(db=db_session, username="reg1")
+    wishlist = get_wishlist_by_name(db=db_session, current_user=reg, name="wishlist1")
+    stock_ids = [stock.id for stock in db_session.query(models.Stock).all()]
+    operations = [{"op": "remove", "stock_id": stock_id} for stock_id in stock_ids[:6]]
+    operations.append({"op": "update", "stock_id": stock_ids[9], "purchase_price": 1})
+
+    # When
+    with assert_max_queries(8):
+        batch_response = client.post(
+            f"/wishlists/{wishlist.id}/stocks/batch", json={"operations": operations}
+        )
+
+    # Then
+    assert batch_response.status_code == 200
+    assert [
+        (wishstock["stock"]["id"], wishstock["order_num"])
+        for wishstock in batch_response.json()["stocks"]
+    ] == [(stock_id, i) for i, stock_id in enumerate(stock_ids[6:])]
+    assert batch_response.json()["stocks"][-1]["purchase_price"] == 1
+
+
+def test_portfolio_summaries_match_client_side_totals(db_session):
+    # Given
+    reg = user_query.get_user_by_username(db=db_session, username="reg1")
+    wishlist = get_wishlist_by_name(db=db_session, current_user=reg, name="wishlist1")
+    other_wishlist = get_wishlist_by_name(
+        db=db_session, current_user=reg, name="nothing_in_wishlist"
+    )
+    for stock in db_session.query(models.Stock).filter(models.Stock.price > 7000):
+        stock.market = "KOSDAQ"
+    db_session.commit()
+    wishlist_query.add_stock_to_wishlist(
+        db=db_session,
+        current_user=reg,
+        wishlist_id=other_wishlist.id,
+        wishstock=schemas.WishStockCreate(
+            stock_id=1, purchase_price=500, holding_num=3
+        ),
+    )
+    wishstocks = client.get(f"/wishlists/{wishlist.id}/stocks").json()
+    wishstocks += client.get(f"/wishlists/{other_wishlist.id}/stocks").json()
+
+    # When
+    with assert_max_queries(3):
+        wishlist_summary = client.get(f"/wishlists/{wishlist.id}/summary").json()
+    with assert_max_queries(2):
+        user_summary = client.get("/wishlists/summary").json()
+
+    # Then
+    total_cost = sum(ws["purchase_price"] * ws["holding_num"] for ws in wishstocks)
+    market_value = sum(ws["stock"]["price"] * ws["holding_num"] for ws in wishstocks)
+    assert user_summary["position_count"] == 11
+    assert user_summary["total_cost"] == total_cost
+    assert user_summary["market_value"] == market_value
+    assert user_summary["profit_loss"] == market_value - total_cost
+    assert user_summary["return_rate"] == round(
+        (market_value - total_cost) * 100 / total_cost, 2
+    )
+    assert [market["market"] for market in user_summary["markets"]] == [
+        "KOSDAQ",
+        "KOSPI",
+    ]
+    assert sum(market["exposure"] for market in user_summary["markets"]) == (
+        pytest.approx(100, abs=0.01)
+    )
+    assert wishlist_summary["position_count"] == 10
+    assert wishlist_summary["total_cost"] == total_cost - 500 * 3
+    assert wishlist_summary["markets"][0] == {
+        "market": "KOSDAQ",
+        "position_count": 3,
+        "total_cost": sum(i * 12000 * (i - 1) * 10 for i in (8, 9, 10)),
+        "market_value": sum(i * 1000 * (i - 1) * 10 for i in (8, 9, 10)),
+        "profit_loss": sum(-i * 11000 * (i - 1) * 10 for i in (8, 9, 10)),
+        "exposure": wishlist_summary["markets"][0]["exposure"],
+    }
+
+
+def test_cached_stock_listing_follows_wishlist_and_price_versions(db_session):
+    # Given
+    reg = user_query.get_user_by_username(db=db_session, username="reg1")
+    wishlist = get_wishlist_by_name(db=db_session, current_user=reg, name="wishlist1")
+    url = f"/wishlists/{wishlist.id}/stocks"
+    client.get(url)
+
+    # When
+    with assert_max_queries(1):
+        cached_response = client.get(url)
+    client.put(f"{url}/1", json={"holding_num": 77})
+    after_update = client.get(url)
+    db_session.query(models.Stock).filter(models.Stock.id == 1).update({"price": 5})
+    versioning.bump_epoch(db_session, versioning.STOCK_PRICES)
+    db_session.commit()
+    after_price_change = client.get(url)
+
+    # Then
+    assert cached_response.json()[0]["holding_num"] == 0
+    assert after_update.json()[0]["holding_num"] == 77
+    assert after_price_change.json()[0]["stock"]["price"] == 5
+
+
+def test_cached_stock_listing_is_shared_between_processes(db_session, monkeypatch):
+    # Given
+    reg = user_query.get_user_by_username(db=db_session, username="reg1")
+    wishlist = get_wishlist_by_name(db=db_session, current_user=reg, name="wishlist1")
+    url = f"/wishlists/{wishlist.id}/stocks"
+    monkeypatch.setattr(
+        wishlist_query.wishlist_cache, "shared", TTLCache(maxsize=16, ttl=60)
+    )
+    first_response = client.get(url)
+
+    # When
+    # A fresh process starts with an empty local tier.
+    wishlist_query.wishlist_cache.local.clear()
+    with assert_max_queries(1):
+        shared_response = client.get(url)
+
+    # Then
+    assert shared_response.json() == first_response.json()
@@ -0,0 +1,289 @@
+import gzip
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from onboarding_app import exceptions, models, versioning
+from onboarding_app.database import get_engine
+from scripts import upsert_stock
+
+TRADE_DATE = date(2022, 9, 30)
+
+
+def _stocks(prices: dict[str, int]) -> list[dict]:
+    return [
+        {
+            **dict.fromkeys(upsert_stock.HISTORY_COLUMNS),
+            "code": code,
+            "name": f"name{code}",
+            "market": "KOSPI",
+            "price": price,
+        }
+        for code, price in prices.items()
+    ]
+
+
+def _price_epoch(db_session) -> int:
+    return db_session.query(versioning.epoch(versioning.STOCK_PRICES)).scalar()
+
+
+def _row_versions(db_session) -> dict[str, str]:
+    # xmin changes whenever Postgres writes a new version of the row.
+    return dict(db_session.execute(text("SELECT code, xmin::text FROM stocks")).all())
+
+
+@pytest.mark.parametrize("use_copy", [False, True])
+def test_upsert_stock_counts_inserted_updated_and_unchanged(db_session, use_copy):
+    # Given
+    engine = get_engine()
+    upsert_stock.upsert_stock(
+        _stocks({"A": 100, "B": 200, "C": 300}), engine, TRADE_DATE
+    )
+    epoch = _price_epoch(db_session)
+    row_versions = _row_versions(db_session)
+
+    # When
+    counts = upsert_stock.upsert_stock(
+        _stocks({"A": 100, "B": 250, "D": 400, "C": 300, "E": 500}),
+        engine,
+        TRADE_DATE,
+        batch_size=2,
+        use_copy=use_copy,
+    )
+    unchanged_counts = upsert_stock.upsert_stock(
+        _stocks({"A": 100}), engine, TRADE_DATE, use_copy=use_copy
+    )
+
+    # Then
+    assert (counts.inserted, counts.updated, counts.unchanged) == (2, 1, 2)
+    assert counts.delisted == 0
+    assert dict(db_session.query(models.Stock.code, models.Stock.price)) == {
+        "A": 100,
+        "B": 250,
+        "C": 300,
+        "D": 400,
+        "E": 500,
+    }
+    stock_ids = dict(db_session.query(models.Stock.code, models.Stock.id))
+    assert counts.changed_ids == {stock_ids["B"], stock_ids["D"], stock_ids["E"]}
+    current_versions = _row_versions(db_session)
+    assert current_versions["A"] == row_versions["A"]
+    assert current_versions["C"] == row_versions["C"]
+    assert current_versions["B"] != row_versions["B"]
+    assert unchanged_counts.changed == 0
+    assert unchanged_counts.changed_ids == set()
+    assert unchanged_counts.delisted == 4
+    assert _price_epoch(db_session) == epoch + 1
+
+
+@pytest.mark.parametrize("use_copy", [False, True])
+def test_upsert_stock_skips_prices_unchanged_since_previous_day(db_session, use_copy):
+    # Given
+    engine = get_engine()
+    previous_day, next_day = date(2022, 9, 29), date(2022, 10, 4)
+    upsert_stock.upsert_stock(
+        _stocks({"A": 100, "B": 200, "C": 300}), engine, previous_day
+    )
+    epoch = _price_epoch(db_session)
+    row_versions = _row_versions(db_session)
+
+    # When
+    counts = upsert_stock.upsert_stock(
+        _stocks({"A": 100, "B": 250, "C": 300}), engine, TRADE_DATE, use_copy=use_copy
+    )
+    next_counts = upsert_stock.upsert_stock(
+        _stocks({"A": 100, "B": 250, "C": 300}), engine, next_day, use_copy=use_copy
+    )
+    backfill_counts = upsert_stock.upsert_stock(
+        _stocks({"A": 90}), engine, TRADE_DATE, use_copy=use_copy
+    )
+
+    # Then
+    assert (counts.inserted, counts.updated, counts.unchanged) == (0, 1, 2)
+    stock_ids = dict(db_session.query(models.Stock.code, models.Stock.id))
+    assert counts.changed_ids == {stock_ids["B"]}
+    assert _row_versions(db_session)["A"] == row_versions["A"]
+    assert (next_counts.changed, next_counts.unchanged) == (0, 3)
+    assert backfill_counts.changed == 0
+    assert _price_epoch(db_session) == epoch + 1
+    assert db_session.query(
+        models.Stock.code, models.Stock.price, models.Stock.price_date
+    ).order_by(models.Stock.code).all() == [
+        ("A", 100, previous_day),
+        ("B", 250, TRADE_DATE),
+        ("C", 300, previous_day),
+    ]
+
+
+def test_upsert_stock_runs_on_sqlite():
+    # Given
+    engine = create_engine("sqlite://")
+    models.Stock.__table__.create(engine)
+    models.StockPrice.__table__.create(engine)
+    models.CacheVersion.__table__.create(engine)
+    upsert_stock.upsert_stock(_stocks({"A": 100, "B": 200}), engine, TRADE_DATE)
+
+    # When
+    counts = upsert_stock.upsert_stock(
+        _stocks({"A": 100, "B": 250, "C": 300}), engine, TRADE_DATE
+    )
+
+    next_counts = upsert_stock.upsert_stock(
+        _stocks({"A": 100, "B": 250, "C": 300}), engine, date(2022, 10, 4)
+    )
+
+    # Then
+    assert (counts.inserted, counts.updated, counts.unchanged) == (1, 1, 1)
+    assert (next_counts.changed, next_counts.unchanged) == (0, 3)
+    with engine.connect() as conn:
+        assert conn.execute(models.CacheVersion.__table__.select()).all() == [
+            (versioning.STOCK_PRICES, 2)
+        ]
+
+
+@pytest.mark.parametrize("use_copy", [False, True])
+def test_upsert_stock_keeps_latest_price_when_loading_older_day(db_session, use_copy):
+    # Given
+    engine = get_engine()
+    upsert_stock.upsert_stock(_stocks({"A": 100}), engine, TRADE_DATE)
+
+    # When
+    counts = upsert_stock.upsert_stock(
+        _stocks({"A": 90, "B": 50}), engine, date(2022, 9, 29), use_copy=use_copy
+    )
+
+    # Then
+    assert (counts.inserted, counts.updated, counts.unchanged) == (1, 0, 1)
+    assert counts.history == 2
+    stocks = {stock.code: stock for stock in db_session.query(models.Stock)}
+    assert (stocks["A"].price, stocks["A"].price_date) == (100, TRADE_DATE)
+    assert db_session.query(
+        models.Stock.code, models.StockPrice.date, models.StockPrice.close
+    ).join(models.StockPrice).order_by(
+        models.Stock.code, models.StockPrice.date
+    ).all() == [
+        ("A", date(2022, 9, 29), 90),
+        ("A", TRADE_DATE, 100),
+        ("B", date(2022, 9, 29), 50),
+    ]
+
+
+def test_get_trade_date_reads_file_name():
+    assert upsert_stock.get_trade_date("resources/data_1205_20220930.csv.gz") == (
+        TRADE_DATE
+    )
+    with pytest.raises(exceptions.InvalidFileError):
+        upsert_stock.get_trade_date("resources/prices.csv")
+
+
+def test_get_insert_rejects_dialects_without_on_conflict():
+    with pytest.raises(ValueError, match="mssql"):
+        upsert_stock.get_insert("mssql")
+
+
+KRX_LINES = [
+    "종가,종목명,시장구분,종목코드,대비",
+    '"2215","3S","KOSDAQ","060310","-30"',
+    '"6800","AJ네트웍스","KOSPI","095570","70"',
+]
+
+
+@pytest.mark.parametrize("opener", [open, gzip.open])
+def test_fetch_stocks_maps_columns_by_header(tmp_path, opener):
+    # Given
+    file_path = tmp_path / "data_0000_20220930.csv"
+    with opener(file_path, "wt", encoding="euc-kr") as stock_file:
+        stock_file.write("\n".join(KRX_LINES) + "\n")
+
+    # When
+    stocks = upsert_stock.fetch_stocks(str(file_path))
+
+    # Then
+    assert list(stocks) == [
+        {
+            **dict.fromkeys(upsert_stock.HISTORY_COLUMNS),
+            "code": "060310",
+            "name": "3S",
+            "market": "KOSDAQ",
+            "price": 2215,
+            "change": -30,
+        },
+        {
+            **dict.fromkeys(upsert_stock.HISTORY_COLUMNS),
+            "code": "095570",
+            "name": "AJ네트웍스",
+            "market": "KOSPI",
+            "price": 6800,
+            "change": 70,
+        },
+    ]
+
+
+def test_fetch_stocks_rejects_unknown_layout(tmp_path):
+    # Given
+    file_path = tmp_path / "data_0000_20220930.csv"
+    file_path.write_text("code,price\n060310,2215\n", encoding="euc-kr")
+
+    # When / Then
+    with pytest.raises(exceptions.InvalidFileError):
+        list(upsert_stock.fetch_stocks(str(file_path)))
+
+
+def test_ingest_applies_pending_files_in_date_order_once(tmp_path, db_session):
+    # Given
+    engine = get_engine()
+    older_lines = [KRX_LINES[0], KRX_LINES[1].replace('"2215"', '"2245"')]
+    (tmp_path / "data_0002_20220929.csv").write_text(
+        "\n".join(older_lines) + "\n", encoding="euc-kr"
+    )
+    (tmp_path / "data_0001_20220930.csv").write_text(
+        "\n".join(KRX_LINES) + "\n", encoding="euc-kr"
+    )
+    (tmp_path / "notes.txt").write_text("not a price file")
+    file_paths = upsert_stock.list_price_files(str(tmp_path))
+
+    # When
+    applied = list(upsert_stock.ingest(file_paths, engine, workers=2))
+    reapplied = list(upsert_stock.ingest(file_paths, engine, workers=2))
+
+    # Then
+    assert [price_file.trade_date for price_file, _ in applied] == [
+        date(2022, 9, 29),
+        TRADE_DATE,
+    ]
+    assert [counts.inserted for _, counts in applied] == [1, 1]
+    assert reapplied == []
+    assert dict(db_session.query(models.Stock.code, models.Stock.price)) == {
+        "060310": 2215,
+        "095570": 6800,
+    }
+    assert db_session.query(
+        models.StockPriceFile.file_name, models.StockPriceFile.inserted
+    ).order_by(models.StockPriceFile.trade_date).all() == [
+        ("data_0002_20220929.csv", 1),
+        ("data_0001_20220930.csv", 1),
+    ]
+
+
+def test_ingest_streams_a_single_file(tmp_path, db_session):
+    # Given
+    file_path = tmp_path / "data_0001_20220930.csv.gz"
+    with gzip.open(file_path, "wt", encoding="euc-kr") as stock_file:
+        stock_file.write("\n".join(KRX_LINES) + "\n")
+
+    # When
+    batches = upsert_stock.parse_file(str(file_path), batch_size=1)
+    applied = list(upsert_stock.ingest([str(file_path)], get_engine(), workers=4))
+
+    # Then
+    assert [[row["code"] for row in batch] for batch in batches] == [
+        ["060310"],
+        ["095570"],
+    ]
+    [(price_file, counts)] = applied
+    assert price_file.checksum == upsert_stock.file_checksum(str(file_path))
+    assert (price_file.trade_date, counts.inserted) == (TRADE_DATE, 2)
+    assert db_session.query(models.StockPriceFile.checksum).scalar() == (
+        price_file.checksum
+    )
@@ -1,6 +1,16 @@
+import threading
+
+from sqlalchemy import text
+
+from onboarding_app import database, dependencies, utils
+from onboarding_app.config import settings
 from onboarding_app.queries import user as user_query
 from onboarding_app.tests.conftest import client
-from onboarding_app.tests.utils import obtain_token_admin, obtain_token_reg
+from onboarding_app.tests.utils import (
+    count_queries,
+    obtain_token_admin,
+    obtain_token_reg,
+)
 
 client.deauthenticate()
 
@@ -38,6 +48,26 @@ def test_login_success():
     assert response_token.json() is not None
 
 
+def test_login_is_rejected_when_password_pool_is_full(monkeypatch):
+    # Given
+    monkeypatch.setattr(utils, "_password_slots", threading.BoundedSemaphore(1))
+    utils._password_slots.acquire()
+
+    # When
+    response_token = client.post(
+        "/users/token",
+        data={
+            "username": "admin",
+            "password": "admin",
+        },
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    )
+
+    # Then
+    assert response_token.status_code == 503
+    assert response_token.headers["Retry-After"] == "1"
+
+
 def test_only_admin_can_fetch_users():
     # Given
     admin_token = obtain_token_admin()
@@ -59,6 +89,29 @@ def test_only_admin_can_fetch_users():
     assert response_users_by_reg1.status_code == 401
 
 
+def test_admin_can_page_users_with_cursor():
+    # Given
+    admin_token = obtain_token_admin()
+    headers = {"Authorization": "Bearer " + admin_token}
+
+    # When
+    first_page = client.get(
+        "/users", params={"limit": 2, "cursor": ""}, headers=headers
+    )
+    last_page = client.get(
+        "/users",
+        params={"limit": 2, "cursor": first_page.json()["next_cursor"]},
+        headers=headers,
+    )
+
+    # Then
+    user_ids = [user["id"] for user in first_page.json()["items"]]
+    user_ids += [user["id"] for user in last_page.json()["items"]]
+    assert len(user_ids) == 3
+    assert user_ids == sorted(user_ids)
+    assert last_page.json()["next_cursor"] is None
+
+
 def test_only_admin_can_get_user(db_session):
     # Given
     admin_token = obtain_token_admin()
@@ -79,3 +132,109 @@ def test_only_admin_can_get_user(db_session):
     assert response_by_admin.status_code == 200
     assert response_by_admin.json()["username"] == "reg1"
     assert response_by_reg1.status_code == 401
+
+
+def test_principal_is_cached_between_requests():
+    # Given
+    user_token = obtain_token_reg("reg1")
+    client.get("/users/me/", headers={"Authorization": "Bearer " + user_token})
+
+    # When
+    with count_queries() as statements:
+        response = client.get(
+            "/wishlists", headers={"Authorization": "Bearer " + user_token}
+        )
+
+    # Then
+    assert response.status_code == 200
+    assert not any("FROM users" in statement for statement in statements)
+
+
+def test_principal_cache_is_invalidated_when_user_is_deactivated(db_session):
+    # Given
+    user_token = obtain_token_reg("reg1")
+    client.get("/users/me/", headers={"Authorization": "Bearer " + user_token})
+
+    # When
+    reg1 = user_query.get_user_by_username(db=db_session, username="reg1")
+    reg1.is_active = False
+    db_session.commit()
+
+    response = client.get(
+        "/users/me/", headers={"Authorization": "Bearer " + user_token}
+    )
+
+    # Then
+    assert response.status_code == 400
+
+
+def test_principal_cache_sees_deactivation_made_outside_the_orm(db_session):
+    # Given
+    user_token = obtain_token_reg("reg1")
+    client.get("/users/me/", headers={"Authorization": "Bearer " + user_token})
+
+    # When
+    db_session.execute(
+        text("UPDATE users SET is_active = false WHERE username = 'reg1'")
+    )
+    db_session.commit()
+    # No ORM event fired; the version check runs once the cached version expires.
+    dependencies.token_version_cache.clear()
+
+    response = client.get(
+        "/users/me/", headers={"Authorization": "Bearer " + user_token}
+    )
+
+    # Then
+    assert response.status_code == 400
+
+
+def test_stateless_token_skips_user_lookup_until_revoked(db_session, monkeypatch):
+    # Given
+    monkeypatch.setattr(settings, "STATELESS_TOKENS", True)
+    user_token = client.post(
+        "/users/token",
+        data={"username": "reg1", "password": "reg1"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    ).json()["access_token"]
+    headers = {"Authorization": "Bearer " + user_token}
+    client.get("/wishlists", headers=headers)
+
+    # When
+    with count_queries() as statements:
+        response = client.get("/wishlists", headers=headers)
+
+    reg1 = user_query.get_user_by_username(db=db_session, username="reg1")
+    reg1.is_admin = True
+    db_session.commit()
+
+    revoked_response = client.get("/wishlists", headers=headers)
+
+    # Then
+    assert response.status_code == 200
+    assert not any("FROM users" in statement for statement in statements)
+    assert reg1.token_version == 1
+    assert revoked_response.status_code == 401
+
+
+def test_only_admin_can_read_pool_status():
+    # Given
+    admin_token = obtain_token_admin()
+    user_token = obtain_token_reg("reg1")
+
+    # When
+    response_by_admin = client.get(
+        "/admin/pool",
+        headers={"Authorization": "Bearer " + admin_token},
+    )
+    response_by_reg1 = client.get(
+        "/admin/pool",
+        headers={"Authorization": "Bearer " + user_token},
+    )
+
+    # Then
+    assert response_by_admin.status_code == 200
+    assert set(response_by_admin.json()) == set(database.get_created_engines())
+    request_pool = "async" if settings.DB_ASYNC else "primary"
+    assert response_by_admin.json()[request_pool]["checkouts"] > 0
+    assert response_by_reg1.status_code == 401
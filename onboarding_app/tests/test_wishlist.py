@@ -1,9 +1,15 @@
 import pytest
 
-from onboarding_app import models, schemas
+from onboarding_app import database, models, ordering, schemas
+from onboarding_app.config import settings
 from onboarding_app.queries import user as user_query, wishlist as wishlist_query
 from onboarding_app.tests.conftest import client
-from onboarding_app.tests.utils import get_wishlist_by_name, obtain_token_reg
+from onboarding_app.tests.utils import (
+    assert_max_queries,
+    count_queries,
+    get_wishlist_by_name,
+    obtain_token_reg,
+)
 
 client.authenticate("reg1")
 
@@ -13,13 +19,14 @@ def test_wishlists_create_success(db_session):
     reg1 = user_query.get_user_by_username(db=db_session, username="reg1")
 
     # When
-    wishlist_response = client.post(
-        "/wishlists",
-        json={
-            "name": "wishlist1",
-            "description": "wishlist1 description",
-        },
-    )
+    with assert_max_queries(3):
+        wishlist_response = client.post(
+            "/wishlists",
+            json={
+                "name": "wishlist1",
+                "description": "wishlist1 description",
+            },
+        )
 
     # Then
     assert wishlist_response.status_code == 200
@@ -43,15 +50,119 @@ def test_wishlists_fetch_success(db_session):
         )
 
     # When
-    wishlists_response = client.get(
-        "/wishlists",
-    )
+    with assert_max_queries(3):
+        wishlists_response = client.get(
+            "/wishlists",
+        )
 
     # Then
     assert wishlists_response.status_code == 200
     assert len(wishlists_response.json()) == 10
 
 
+def _walk_pages(url: str, **params) -> list[dict]:
+    items, cursor = [], ""
+    while cursor is not None:
+        with assert_max_queries(2):
+            page_response = client.get(url, params={**params, "cursor": cursor})
+        assert page_response.status_code == 200
+        items += page_response.json()["items"]
+        cursor = page_response.json()["next_cursor"]
+    return items
+
+
+@pytest.mark.parametrize("sort", ["created_at", "updated_at"])
+@pytest.mark.parametrize("order_by", ["desc", "asc"])
+def test_wishlists_fetch_with_cursor(db_session, sort, order_by):
+    # Given
+    reg1 = user_query.get_user_by_username(db=db_session, username="reg1")
+    _create_wishlists(db_session, reg1, 7)
+    params = {"sort": sort, "order_by": order_by}
+    offset_response = client.get("/wishlists", params={**params, "limit": 100})
+
+    # When
+    wishlists = _walk_pages("/wishlists", limit=3, **params)
+
+    # Then
+    assert wishlists == offset_response.json()
+    assert sorted(wishlist["order_num"] for wishlist in wishlists) == list(range(7))
+
+
+def test_wishlists_fetch_rejects_foreign_cursor(db_session):
+    # Given
+    reg1 = user_query.get_user_by_username(db=db_session, username="reg1")
+    _create_wishlists(db_session, reg1, 3)
+    first_page = client.get("/wishlists", params={"limit": 1, "cursor": ""})
+
+    # When
+    responses = [
+        client.get(
+            "/wishlists",
+            params={"sort": "updated_at", "cursor": first_page.json()["next_cursor"]},
+        ),
+        client.get("/wishlists", params={"cursor": "not-a-cursor"}),
+    ]
+
+    # Then
+    assert [response.status_code for response in responses] == [400, 400]
+
+
+def test_wishlists_fetch_with_cursor_and_empty_limit(db_session):
+    # Given
+    reg1 = user_query.get_user_by_username(db=db_session, username="reg1")
+    _create_wishlists(db_session, reg1, 2)
+    first_page = client.get("/wishlists", params={"limit": 1, "cursor": ""})
+
+    # When
+    responses = [
+        client.get("/wishlists", params={"limit": 0, "cursor": cursor})
+        for cursor in ["", first_page.json()["next_cursor"]]
+    ]
+    negative_response = client.get("/wishlists", params={"limit": -1, "cursor": ""})
+
+    # Then
+    assert [response.status_code for response in responses] == [200, 200]
+    assert [response.json() for response in responses] == [
+        {"items": [], "next_cursor": None}
+    ] * 2
+    assert negative_response.status_code == 400
+
+
+def test_wishlist_reads_answer_matching_etags_with_304(db_session):
+    # Given
+    reg1 = user_query.get_user_by_username(db=db_session, username="reg1")
+    wishlist = _create_wishlists(db_session, reg1, 2)[0]
+    urls = [
+        "/wishlists",
+        f"/wishlists/{wishlist.id}",
+        f"/wishlists/{wishlist.id}/stocks",
+    ]
+    etags = [client.get(url).headers["ETag"] for url in urls]
+
+    # When
+    with assert_max_queries(len(urls)):
+        unchanged = [
+            client.get(url, headers={"If-None-Match": etag})
+            for url, etag in zip(urls, etags)
+        ]
+    client.put(f"/wishlists/{wishlist.id}", json={"description": "changed"})
+    changed = [
+        client.get(url, headers={"If-None-Match": etag})
+        for url, etag in zip(urls, etags)
+    ]
+
+    # Then
+    assert [response.status_code for response in unchanged] == [304, 304, 304]
+    assert [response.headers["ETag"] for response in unchanged] == etags
+    assert all(not response.content for response in unchanged)
+    assert [response.status_code for response in changed] == [200, 200, 200]
+    assert all(
+        response.headers["ETag"] != etag for response, etag in zip(changed, etags)
+    )
+    other_page = client.get("/wishlists", params={"limit": 1})
+    assert other_page.headers["ETag"] != changed[0].headers["ETag"]
+
+
 def test_wishlists_get_success(db_session):
     # Given
     reg1 = user_query.get_user_by_username(db=db_session, username="reg1")
@@ -66,12 +177,16 @@ def test_wishlists_get_success(db_session):
     )
 
     # When
-    wishlist_response_by_reg1 = client.get(
-        f"/wishlists/{wishlist.id}",
-    )
+    with assert_max_queries(4):
+        wishlist_response_by_reg1 = client.get(
+            f"/wishlists/{wishlist.id}",
+        )
+    with assert_max_queries(1):
+        cached_response = client.get(f"/wishlists/{wishlist.id}")
 
     # Then
     assert wishlist_response_by_reg1.status_code == 200
+    assert cached_response.json() == wishlist_response_by_reg1.json()
     assert wishlist_response_by_reg1.json()["name"] == "wishlist1"
     assert wishlist_response_by_reg1.json()["user_id"] == reg1.id
 
@@ -114,13 +229,14 @@ def test_wishlists_update_success(db_session):
     )
 
     # When
-    wishlist_response_by_reg1 = client.put(
-        f"/wishlists/{wishlist.id}",
-        json={
-            "name": "wishlist1 updated",
-            "description": "wishlist1 description updated",
-        },
-    )
+    with assert_max_queries(4):
+        wishlist_response_by_reg1 = client.put(
+            f"/wishlists/{wishlist.id}",
+            json={
+                "name": "wishlist1 updated",
+                "description": "wishlist1 description updated",
+            },
+        )
 
     # Then
     assert wishlist_response_by_reg1.status_code == 200
@@ -129,6 +245,11 @@ def test_wishlists_update_success(db_session):
         wishlist_response_by_reg1.json()["description"]
         == "wishlist1 description updated"
     )
+    fetched_wishlist = client.get(f"/wishlists/{wishlist.id}").json()
+    assert (
+        wishlist_response_by_reg1.json()["updated_at"] == fetched_wishlist["updated_at"]
+    )
+    assert wishlist_response_by_reg1.json()["updated_at"].endswith("+00:00")
 
 
 def test_wishlists_delete_success(db_session):
@@ -144,9 +265,10 @@ def test_wishlists_delete_success(db_session):
     )
 
     # When
-    wishlist_response_by_reg1 = client.delete(
-        f"/wishlists/{wishlist.id}",
-    )
+    with assert_max_queries(6):
+        wishlist_response_by_reg1 = client.delete(
+            f"/wishlists/{wishlist.id}",
+        )
 
     wishlist_query_res = db_session.query(models.Wishlist).filter(
         models.Wishlist.id == wishlist.id
@@ -218,10 +340,11 @@ def test_change_wishlist_order(db_session, origin_order: int, hope_order: int):
     )
 
     # When
-    wishlist_order_response = client.put(
-        f"/wishlists/{target_wishlist.id}/order",
-        params={"hope_order": hope_order},
-    )
+    with assert_max_queries(6):
+        wishlist_order_response = client.put(
+            f"/wishlists/{target_wishlist.id}/order",
+            params={"hope_order": hope_order},
+        )
 
     # Then
     assert wishlist_order_response.status_code == 200
@@ -245,3 +368,254 @@ def test_change_wishlist_order(db_session, origin_order: int, hope_order: int):
         else:
             gap = 1 if origin_order < hope_order else -1
             assert wishlist.name == f"wishlist{i + gap}"
+
+
+def _create_wishlists(db_session, user, count: int) -> list[models.Wishlist]:
+    return [
+        wishlist_query.create_wishlist(
+            db=db_session,
+            current_user=user,
+            wishlist=schemas.WishlistCreate(
+                name=f"wishlist{i}", description=f"wishlist{i} description"
+            ),
+        )
+        for i in range(count)
+    ]
+
+
+def _order_keys(db_session, user) -> dict[str, int]:
+    db_session.expire_all()
+    return dict(
+        db_session.query(models.Wishlist.name, models.Wishlist.order_key)
+        .filter(models.Wishlist.user_id == user.id)
+        .order_by(models.Wishlist.order_key)
+        .all()
+    )
+
+
+def _versions(db_session, user) -> dict[str, int]:
+    db_session.expire_all()
+    return dict(
+        db_session.query(models.Wishlist.name, models.Wishlist.version).filter(
+            models.Wishlist.user_id == user.id
+        )
+    )
+
+
+def test_sparse_order_move_and_delete_touch_one_row(db_session, monkeypatch):
+    # Given
+    monkeypatch.setattr(settings, "ORDER_MODE", "sparse")
+    reg1 = user_query.get_user_by_username(db=db_session, username="reg1")
+    wishlists = _create_wishlists(db_session, reg1, 5)
+    keys_before = _order_keys(db_session, reg1)
+    versions_before = _versions(db_session, reg1)
+    cached_sibling = client.get(f"/wishlists/{wishlists[2].id}")
+
+    # When
+    move_response = client.put(
+        f"/wishlists/{wishlists[0].id}/order", params={"hope_order": 3}
+    )
+    delete_response = client.delete(f"/wishlists/{wishlists[1].id}")
+
+    # Then
+    assert move_response.status_code == 200
+    assert move_response.json()["order_num"] == 3
+    assert delete_response.status_code == 200
+    keys_after = _order_keys(db_session, reg1)
+    assert list(keys_after) == ["wishlist2", "wishlist3", "wishlist0", "wishlist4"]
+    assert {name for name, key in keys_after.items() if keys_before[name] != key} == {
+        "wishlist0"
+    }
+    assert {
+        name
+        for name, version in _versions(db_session, reg1).items()
+        if versions_before[name] != version
+    } == set()
+    assert cached_sibling.json()["order_num"] == 2
+    assert client.get(f"/wishlists/{wishlists[2].id}").json()["order_num"] == 0
+
+    wishlists_response = client.get("/wishlists", params={"order_by": "asc"})
+    assert {
+        wishlist["name"]: wishlist["order_num"]
+        for wishlist in wishlists_response.json()
+    } == {"wishlist0": 2, "wishlist2": 0, "wishlist3": 1, "wishlist4": 3}
+
+
+@pytest.mark.parametrize("order_mode", ["dense", "sparse"])
+def test_only_position_reads_count_siblings(db_session, monkeypatch, order_mode):
+    # Given
+    monkeypatch.setattr(settings, "ORDER_MODE", order_mode)
+    reg1 = user_query.get_user_by_username(db=db_session, username="reg1")
+    wishlists = _create_wishlists(db_session, reg1, 3)
+
+    # When
+    with count_queries() as position_statements:
+        positions = [
+            client.get(f"/wishlists/{wishlist.id}").json()["order_num"]
+            for wishlist in wishlists
+        ]
+        page = client.get("/wishlists", params={"cursor": "", "order_by": "asc"})
+    with count_queries() as other_statements:
+        client.post(
+            f"/wishlists/{wishlists[0].id}/comments", json={"content": "comment"}
+        )
+        client.get(f"/wishlists/{wishlists[0].id}/summary")
+
+    # Then
+    assert positions == [0, 1, 2]
+    assert [wishlist["order_num"] for wishlist in page.json()["items"]] == [0, 1, 2]
+    counts = [
+        statement
+        for statement in position_statements
+        if "count(wishlists_1.id)" in statement
+    ]
+    assert len(counts) == (0 if order_mode == "dense" else 4)
+    assert not any("count(wishlists_1.id)" in s for s in other_statements)
+
+
+@pytest.mark.parametrize(
+    "order_keys, expected_keys",
+    (
+        # No room between 0 and 1: compacted before the move.
+        ([0, 1, 1024], [0, 512, 1024]),
+        # The move takes the last free key between 0 and 2: compacted after.
+        ([0, 2, 1024], [0, 1024, 2048]),
+    ),
+)
+def test_sparse_order_compacts_when_gaps_run_out(
+    db_session, monkeypatch, order_keys: list[int], expected_keys: list[int]
+):
+    # Given
+    monkeypatch.setattr(settings, "ORDER_MODE", "sparse")
+    # Background compaction must use the requests' engine, not open the other.
+    unused_sessions = "SessionLocal" if settings.DB_ASYNC else "AsyncSessionLocal"
+    monkeypatch.setattr(database, unused_sessions, None)
+    reg1 = user_query.get_user_by_username(db=db_session, username="reg1")
+    wishlists = _create_wishlists(db_session, reg1, 3)
+    for wishlist, order_key in zip(wishlists, order_keys):
+        wishlist.order_key = order_key
+    db_session.commit()
+
+    # When
+    response = client.put(
+        f"/wishlists/{wishlists[2].id}/order", params={"hope_order": 1}
+    )
+
+    # Then
+    assert response.status_code == 200
+    assert response.json()["order_num"] == 1
+    assert _order_keys(db_session, reg1) == dict(
+        zip(["wishlist0", "wishlist2", "wishlist1"], expected_keys)
+    )
+
+
+def test_dense_move_compacts_keys_left_by_sparse_mode(db_session, monkeypatch):
+    # Given
+    reg1 = user_query.get_user_by_username(db=db_session, username="reg1")
+    wishlists = _create_wishlists(db_session, reg1, 3)
+    for wishlist, order_key in zip(wishlists, [0, 1024, 2048]):
+        wishlist.order_key = order_key
+    db_session.commit()
+    monkeypatch.setattr(settings, "ORDER_MODE", "dense")
+
+    # When
+    move_response = client.put(
+        f"/wishlists/{wishlists[0].id}/order", params={"hope_order": 1}
+    )
+    wishlists_response = client.get("/wishlists", params={"order_by": "asc"})
+
+    # Then
+    assert move_response.json()["order_num"] == 1
+    assert {
+        wishlist["name"]: wishlist["order_num"]
+        for wishlist in wishlists_response.json()
+    } == {"wishlist1": 0, "wishlist0": 1, "wishlist2": 2}
+    assert _order_keys(db_session, reg1) == {
+        "wishlist1": 0,
+        "wishlist0": 1,
+        "wishlist2": 2,
+    }
+
+
+def test_compact_respaces_every_list(db_session, monkeypatch):
+    # Given
+    users = [
+        user_query.get_user_by_username(db=db_session, username=username)
+        for username in ("reg1", "reg2")
+    ]
+    for user in users:
+        for wishlist, order_key in zip(
+            _create_wishlists(db_session, user, 3), [5, 1024, 4096]
+        ):
+            wishlist.order_key = order_key
+    db_session.commit()
+    monkeypatch.setattr(settings, "ORDER_MODE", "dense")
+
+    # When
+    ordering.compact(db_session, models.Wishlist.user_id)
+    db_session.commit()
+
+    # Then
+    for user in users:
+        assert _order_keys(db_session, user) == {
+            "wishlist0": 0,
+            "wishlist1": 1,
+            "wishlist2": 2,
+        }
+
+
+def test_reorder_wishlists_in_one_request(db_session):
+    # Given
+    reg1 = user_query.get_user_by_username(db=db_session, username="reg1")
+    wishlists = _create_wishlists(db_session, reg1, 5)
+    new_order = [wishlist.id for wishlist in reversed(wishlists)]
+
+    # When
+    with assert_max_queries(5):
+        reorder_response = client.put(
+            "/wishlists/order", json={"wishlist_ids": new_order}
+        )
+
+    # Then
+    assert reorder_response.status_code == 200
+    assert [wishlist["id"] for wishlist in reorder_response.json()] == new_order
+    assert [wishlist["order_num"] for wishlist in reorder_response.json()] == [
+        0,
+        1,
+        2,
+        3,
+        4,
+    ]
+    assert list(_order_keys(db_session, reg1)) == [
+        f"wishlist{i}" for i in reversed(range(5))
+    ]
+
+
+@pytest.mark.parametrize(
+    "make_order",
+    (
+        lambda ids, other_id: ids[:-1],  # missing a wishlist
+        lambda ids, other_id: ids + ids[:1],  # duplicated wishlist
+        lambda ids, other_id: ids[:-1] + [other_id],  # someone else's wishlist
+    ),
+)
+def test_reorder_wishlists_rejects_non_permutations(db_session, make_order):
+    # Given
+    reg1 = user_query.get_user_by_username(db=db_session, username="reg1")
+    reg2 = user_query.get_user_by_username(db=db_session, username="reg2")
+    wishlist_ids = [wishlist.id for wishlist in _create_wishlists(db_session, reg1, 3)]
+    other_wishlist = _create_wishlists(db_session, reg2, 1)[0]
+
+    # When
+    reorder_response = client.put(
+        "/wishlists/order",
+        json={"wishlist_ids": make_order(wishlist_ids, other_wishlist.id)},
+    )
+
+    # Then
+    assert reorder_response.status_code == 400
+    assert list(_order_keys(db_session, reg1)) == [
+        "wishlist0",
+        "wishlist1",
+        "wishlist2",
+    ]
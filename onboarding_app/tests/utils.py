@@ -1,9 +1,12 @@
+from contextlib import contextmanager
 from datetime import timedelta
 
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
 from onboarding_app import exceptions, models, schemas, utils
 from onboarding_app.config import settings
+from onboarding_app.database import get_async_engine, get_engine
 
 
 def obtain_token_admin():
@@ -31,3 +34,31 @@ def get_wishlist_by_name(
     if not db_wishlist.first():
         raise exceptions.DataDoesNotExistError
     return db_wishlist.first()
+
+
+@contextmanager
+def count_queries():
+    statements: list[str] = []
+
+    def _collect(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # Requests run on the async engine in DB_ASYNC mode; fixtures use the sync one.
+    engines = [get_engine()]
+    if settings.DB_ASYNC:
+        engines.append(get_async_engine().sync_engine)
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _collect)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", _collect)
+
+
+@contextmanager
+def assert_max_queries(n: int):
+    with count_queries() as statements:
+        yield statements
+    executed = "\n".join(statements)
+    assert len(statements) <= n, f"expected at most {n} statements:\n{executed}"
@@ -1,5 +1,8 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Union
+from typing import Callable, Optional, Union
 
 from jose import jwt
 from passlib.context import CryptContext
@@ -9,16 +12,52 @@ from onboarding_app import exceptions
 from onboarding_app.config import settings
 from onboarding_app.database import Base
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
+
+# bcrypt releases the GIL, so a small dedicated pool keeps hashing off the event
+# loop and out of Starlette's shared threadpool. Work beyond the queue limit is
+# rejected instead of piling up behind a login storm.
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+_password_slots = threading.BoundedSemaphore(
+    settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE
+)
+
+
+def _submit_password_task(fn: Callable, *args) -> Future:
+    if not _password_slots.acquire(blocking=False):
+        raise exceptions.ServerBusyError
+    try:
+        future = _password_executor.submit(fn, *args)
+    except BaseException:
+        _password_slots.release()
+        raise
+    future.add_done_callback(lambda _: _password_slots.release())
+    return future
 
 
 # OAuth2
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return _submit_password_task(
+        pwd_context.verify, plain_password, hashed_password
+    ).result()
 
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return _submit_password_task(pwd_context.hash, password).result()
+
+
+async def verify_password_async(plain_password, hashed_password):
+    return await asyncio.wrap_future(
+        _submit_password_task(pwd_context.verify, plain_password, hashed_password)
+    )
+
+
+async def get_password_hash_async(password):
+    return await asyncio.wrap_future(_submit_password_task(pwd_context.hash, password))
 
 
 def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None):
@@ -38,11 +77,14 @@ def reorder(
     target_model_obj: Base,
     hope_order: int,
     modelList_query_res_by_foreign_key: Query,
+    list_size: Optional[int] = None,
 ):
-    if hope_order < 0 or hope_order >= modelList_query_res_by_foreign_key.count():
+    if list_size is None:
+        list_size = modelList_query_res_by_foreign_key.count()
+    if hope_order < 0 or hope_order >= list_size:
         raise exceptions.InvalidQueryError
 
-    origin_order = target_model_obj.order_num
+    origin_order = target_model_obj.order_key
     if hope_order > origin_order:
         _reorder_upper_items(
             modelList_query_res_by_foreign_key,
@@ -56,7 +98,7 @@ def reorder(
             target_model_obj,
             hope_order,
         )
-    target_model_obj.order_num = hope_order
+    target_model_obj.order_key = hope_order
 
 
 def _reorder_upper_items(
@@ -65,10 +107,10 @@ def _reorder_upper_items(
     hope_order: int,
 ):
     query_res_filter_by_foreign_key.filter(
-        target_model.__class__.order_num > target_model.order_num,
-        target_model.__class__.order_num <= hope_order,
+        target_model.__class__.order_key > target_model.order_key,
+        target_model.__class__.order_key <= hope_order,
     ).update(
-        {target_model.__class__.order_num: target_model.__class__.order_num - 1},
+        {target_model.__class__.order_key: target_model.__class__.order_key - 1},
         synchronize_session=False,
     )
 
@@ -79,9 +121,9 @@ def _reorder_lower_items(
     hope_order: int,
 ):
     query_res_filter_by_foreign_key.filter(
-        target_model.__class__.order_num < target_model.order_num,
-        target_model.__class__.order_num >= hope_order,
+        target_model.__class__.order_key < target_model.order_key,
+        target_model.__class__.order_key >= hope_order,
     ).update(
-        {target_model.__class__.order_num: target_model.__class__.order_num + 1},
+        {target_model.__class__.order_key: target_model.__class__.order_key + 1},
         synchronize_session=False,
     )
@@ -0,0 +1,69 @@
+from typing import Callable, Union
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ColumnElement
+
+from onboarding_app import models
+
+STOCK_PRICES = "stock_prices"
+# Per user: "user_wishlists:<user id>", bumped when positions in the list shift.
+USER_WISHLISTS = "user_wishlists:"
+DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def user_wishlists(user_id) -> Union[str, ColumnElement]:
+    """Epoch name of a user's wishlist list; ``user_id`` may be a column."""
+    if isinstance(user_id, int):
+        return f"{USER_WISHLISTS}{user_id}"
+    return func.concat(USER_WISHLISTS, user_id)
+
+
+def get_insert(dialect: str) -> Callable:
+    """The dialect's ``insert`` with ON CONFLICT support, which upserts need."""
+    try:
+        return DIALECT_INSERTS[dialect]
+    except KeyError:
+        raise ValueError(
+            f"upserts need INSERT ... ON CONFLICT, which the {dialect} dialect "
+            f"lacks; supported: {', '.join(DIALECT_INSERTS)}"
+        )
+
+
+def bump_wishlist_versions(db: Session, *criteria) -> None:
+    """Invalidate cached reads of the matching wishlists.
+
+    Runs inside the caller's transaction, so the new version becomes visible
+    together with the write it stands for.
+    """
+    db.execute(
+        update(models.Wishlist)
+        .where(*criteria)
+        .values(version=models.Wishlist.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def epoch(name: Union[str, ColumnElement]):
+    """Scalar subquery for a named counter; 0 until it is first bumped."""
+    return func.coalesce(
+        select(models.CacheVersion.version)
+        .where(models.CacheVersion.name == name)
+        .scalar_subquery(),
+        0,
+    )
+
+
+def bump_epoch(connection: Union[Connection, Session], name: str) -> None:
+    # A single upsert, so two transactions creating the same counter don't race.
+    cache_versions = models.CacheVersion.__table__
+    bind = connection.get_bind() if isinstance(connection, Session) else connection
+    insert = get_insert(bind.dialect.name)(cache_versions).values(name=name, version=1)
+    connection.execute(
+        insert.on_conflict_do_update(
+            index_elements=[cache_versions.c.name],
+            set_={"version": cache_versions.c.version + 1},
+        )
+    )
@@ -0,0 +1,88 @@
+"""Login storm benchmark.
+
+Fires concurrent ``POST /users/token`` requests at a running server while a
+probe thread keeps calling an unrelated endpoint, then reports login throughput
+and the probe latency percentiles.
+
+    python scripts/bench_login.py --url http://localhost:8000 \\
+        --username admin --password admin --logins 200 --concurrency 16
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--probe-path", default="/users/me/")
+    parser.add_argument(
+        "--no-probe", action="store_true", help="measure login throughput alone"
+    )
+    args = parser.parse_args()
+
+    token = _login(args.url, args.username, args.password).json()["access_token"]
+
+    stop = threading.Event()
+    probe_latencies: list[float] = []
+    probe = threading.Thread(
+        target=_probe,
+        args=(args.url + args.probe_path, token, stop, probe_latencies),
+    )
+    if not args.no_probe:
+        probe.start()
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        status_codes = list(
+            executor.map(
+                lambda _: _login(args.url, args.username, args.password).status_code,
+                range(args.logins),
+            )
+        )
+    elapsed = time.perf_counter() - started_at
+
+    stop.set()
+    if not args.no_probe:
+        probe.join()
+
+    succeeded = status_codes.count(200)
+    print(f"logins: {succeeded}/{args.logins} ok, {status_codes.count(503)} busy")
+    print(f"login throughput: {succeeded / elapsed:.1f} req/s")
+    print(f"probe requests: {len(probe_latencies)}")
+    print(f"probe p50: {_percentile(probe_latencies, 50) * 1000:.1f} ms")
+    print(f"probe p99: {_percentile(probe_latencies, 99) * 1000:.1f} ms")
+
+
+def _login(url: str, username: str, password: str) -> requests.Response:
+    return requests.post(
+        url + "/users/token",
+        data={"username": username, "password": password},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    )
+
+
+def _probe(url: str, token: str, stop: threading.Event, latencies: list[float]):
+    headers = {"Authorization": f"Bearer {token}"}
+    while not stop.is_set():
+        started_at = time.perf_counter()
+        requests.get(url, headers=headers)
+        latencies.append(time.perf_counter() - started_at)
+
+
+def _percentile(values: list[float], percent: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100)[percent - 1]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Worker startup benchmark.
+
+Spawns a fresh uvicorn worker several times and measures how long it takes
+from process start until the first HTTP response, plus the bare import time
+of ``onboarding_app.main``.
+
+    python scripts/bench_startup.py --runs 5
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+IMPORT_TIMER = (
+    "import time; started_at = time.perf_counter(); import onboarding_app.main; "
+    "print(time.perf_counter() - started_at)"
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default="/openapi.json")
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    import_times = [_measure_import() for _ in range(args.runs)]
+    first_response_times = [
+        _measure_first_response(args.port, args.path, args.timeout)
+        for _ in range(args.runs)
+    ]
+
+    print(f"import onboarding_app.main: {_summary(import_times)}")
+    print(f"spawn to first response:    {_summary(first_response_times)}")
+
+
+def _measure_import() -> float:
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_TIMER])
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def _measure_first_response(port: int, path: str, timeout: float) -> float:
+    started_at = time.perf_counter()
+    worker = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "onboarding_app.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ]
+    )
+    try:
+        while time.perf_counter() - started_at < timeout:
+            try:
+                requests.get(f"http://127.0.0.1:{port}{path}", timeout=1)
+                return time.perf_counter() - started_at
+            except requests.ConnectionError:
+                time.sleep(0.005)
+        raise TimeoutError(f"worker did not answer within {timeout}s")
+    finally:
+        worker.terminate()
+        worker.wait()
+
+
+def _summary(values: list[float]) -> str:
+    return (
+        f"median {statistics.median(values) * 1000:.0f} ms, "
+        f"min {min(values) * 1000:.0f} ms, max {max(values) * 1000:.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Respace every wishlist and wishlist stock order key for the ORDER_MODE set.
+
+Dense mode reads the stored key as the position, so keys written in sparse
+mode must be compacted when switching to dense; switching to sparse respaces
+the gaps. Run this once after changing the mode, with the new mode in the
+environment, before serving requests:
+
+    ORDER_MODE=dense python -m scripts.compact_order [--database-url ...]
+
+Positions (the order of each list) are unchanged, so cached reads stay valid.
+"""
+import argparse
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from onboarding_app import database, models, ordering
+from onboarding_app.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    engine = (
+        create_engine(args.database_url) if args.database_url else database.get_engine()
+    )
+    with Session(engine) as db:
+        ordering.compact(db, models.Wishlist.user_id)
+        ordering.compact(db, models.WishlistXstock.wishlist_id)
+        db.commit()
+    print(f"order keys compacted for ORDER_MODE={settings.ORDER_MODE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+#!/bin/bash
+
+# apply pending schema migrations (see migrations/versions)
+alembic upgrade head
@@ -1,2 +1,2 @@
 #!/bin/bash
-uvicorn onboarding_app.main:app --host 0.0.0.0 --reload;
\ No newline at end of file
+scripts/migrate.sh && uvicorn onboarding_app.main:app --host 0.0.0.0 --reload;
\ No newline at end of file
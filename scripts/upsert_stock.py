@@ -1,55 +1,670 @@
+"""Stock price ingestion.
+
+Streams KRX daily price files (optionally gzipped) into ``stocks`` and the
+``stock_prices`` history in batches, one transaction per file, and reports
+how many stocks were new, changed, unchanged or delisted (known but missing
+from the file; they are only counted).
+
+    python scripts/upsert_stock.py [resources | resources/data_1205_20220930.csv] \\
+        --batch-size 1000 [--copy] [--workers 4] \\
+        [--database-url sqlite:///local.db] [--changed-ids changed.txt]
+
+Loaded files are recorded with their sha256 in ``stock_price_files``, so
+rerunning over a directory only loads what is new. Pending files are parsed
+in a process pool and written by a single connection, oldest trade date first.
+
+Only new and changed stocks are written: the file is compared against a
+snapshot of current prices (or, with ``--copy``, against the staging table),
+so an unchanged price costs no dead tuple or index update.
+
+The trade date comes from the file name (``data_<id>_<YYYYMMDD>.csv``).
+``Stock.price`` always holds the latest close and ``price_date`` the trade
+date it last moved on: loading an older file adds its history rows but leaves
+newer prices alone, and a close equal to the previous one is not rewritten.
+
+Postgres uses ``INSERT ... ON CONFLICT`` (or, with ``--copy``, ``COPY`` into a
+temporary table followed by ``INSERT ... SELECT ... ON CONFLICT``); SQLite is
+supported for local runs.
+"""
+import argparse
+import collections
 import csv
+import gzip
+import hashlib
+import io
+import itertools
+import os
+import pickle
+import re
+import tempfile
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional, TextIO
+
+from sqlalchemy import (
+    and_,
+    create_engine,
+    exists,
+    func,
+    literal_column,
+    or_,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection, Engine
+
+from onboarding_app import database, exceptions, models, versioning
+from onboarding_app.versioning import DIALECT_INSERTS, get_insert
+
+RESOURCES_DIR = "./resources"
+DEFAULT_BATCH_SIZE = 1000
+STOCK_COLUMNS = ("code", "name", "market", "price")
+# stock_prices columns read from the file besides the close (``price``).
+HISTORY_COLUMNS = (
+    "open",
+    "high",
+    "low",
+    "change",
+    "change_rate",
+    "volume",
+    "traded_value",
+    "market_cap",
+    "shares_outstanding",
+)
+# KRX header name -> row key. Only the STOCK_COLUMNS ones are required.
+KRX_COLUMNS = {
+    "종목코드": "code",
+    "종목명": "name",
+    "시장구분": "market",
+    "종가": "price",
+    "시가": "open",
+    "고가": "high",
+    "저가": "low",
+    "대비": "change",
+    "등락률": "change_rate",
+    "거래량": "volume",
+    "거래대금": "traded_value",
+    "시가총액": "market_cap",
+    "상장주식수": "shares_outstanding",
+}
+KRX_ENCODING = "euc-kr"
+GZIP_MAGIC = b"\x1f\x8b"
+TRADE_DATE_PATTERN = re.compile(r"_(\d{8})\.csv(\.gz)?$")
+CHECKSUM_CHUNK_SIZE = 1 << 20
+
+
+class UpsertCounts:
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        # Known stocks missing from the file; reported, never deleted.
+        self.delisted = 0
+        self.history = 0
+        # Stocks whose price was inserted or moved, for downstream consumers.
+        self.changed_ids: set[int] = set()
 
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy.dialects.sqlite import insert
-from sqlalchemy.engine.base import Engine
+    @property
+    def changed(self) -> int:
+        return self.inserted + self.updated
 
-from onboarding_app import database, exceptions, models
+    def add(self, total: int, inserted: int, updated: int):
+        self.inserted += inserted
+        self.updated += updated
+        self.unchanged += total - inserted - updated
 
-file_name = ["data_3035_20220929.csv", "data_1205_20220930.csv"]
-DB_CSV_DIR = "./resources/" + file_name[1]
 
-SQL_APP_DB_ENGINE = database.engine
+class PriceFile(NamedTuple):
+    path: str
+    checksum: str
+    trade_date: date
 
 
 def main():
-    new_stock_list = fetch_stocks(file_path=DB_CSV_DIR)
-    upsert_stock(stock_list=new_stock_list, db=SQL_APP_DB_ENGINE)
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "path", nargs="?", default=RESOURCES_DIR, help="a KRX file or a directory"
+    )
+    parser.add_argument("--database-url")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--encoding", default=KRX_ENCODING)
+    parser.add_argument(
+        "--copy", action="store_true", help="load through COPY (Postgres only)"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="parsing processes (default: one per CPU)"
+    )
+    parser.add_argument(
+        "--changed-ids", help="write the ids of stocks whose price changed here"
+    )
+    args = parser.parse_args()
 
+    engine = (
+        create_engine(args.database_url) if args.database_url else database.get_engine()
+    )
+    if engine.dialect.name not in DIALECT_INSERTS:
+        parser.error(f"unsupported database dialect: {engine.dialect.name}")
+    file_paths = (
+        list_price_files(args.path) if os.path.isdir(args.path) else [args.path]
+    )
+    started_at = time.perf_counter()
+    changed_ids = set()
+    applied = ingest(
+        file_paths,
+        db=engine,
+        batch_size=args.batch_size,
+        use_copy=args.copy,
+        encoding=args.encoding,
+        workers=args.workers,
+    )
+    for price_file, counts in applied:
+        changed_ids |= counts.changed_ids
+        print(
+            f"{os.path.basename(price_file.path)}: new={counts.inserted} "
+            f"changed={counts.updated} unchanged={counts.unchanged} "
+            f"delisted={counts.delisted} history={counts.history}"
+        )
+    if args.changed_ids:
+        with open(args.changed_ids, "w") as changed_file:
+            changed_file.writelines(f"{i}\n" for i in sorted(changed_ids))
+    print(f"elapsed={time.perf_counter() - started_at:.3f}s")
+
+
+def get_trade_date(file_path: str) -> date:
+    matched = TRADE_DATE_PATTERN.search(os.path.basename(file_path))
+    if not matched:
+        raise exceptions.InvalidFileError(f"no trade date in {file_path}")
+    return datetime.strptime(matched.group(1), "%Y%m%d").date()
 
-def fetch_stocks(file_path: str):
+
+def fetch_stocks(file_path: str, encoding: str = KRX_ENCODING) -> Iterator[dict]:
+    """Yield one dict per line of a KRX daily price file, keyed as KRX_COLUMNS.
+
+    Columns are found by their header names, gzip input is detected from its
+    magic number, and lines are read lazily so memory does not grow with the
+    file. Optional columns that are absent or blank come back as None.
+    """
     try:
-        f = open(file_path, "r", encoding="euc-kr")
-        csv_data_file = csv.reader(f)
-        new_stock_list = []
-
-        for line in csv_data_file:
-            if line[0] == "종목코드":
-                continue
-            db_stock = models.Stock(
-                code=line[0], market=line[2], name=line[1], price=int(line[4])
-            )
-            new_stock_list.append(db_stock)
-        f.close()
-        return new_stock_list
+        stock_file = _open_text(file_path, encoding)
     except FileNotFoundError:
         raise exceptions.FileOpenError
+    with stock_file:
+        lines = csv.reader(stock_file)
+        header = next(lines, [])
+        keys = [(KRX_COLUMNS.get(name), i) for i, name in enumerate(header)]
+        keys = [(key, i) for key, i in keys if key is not None]
+        missing = set(STOCK_COLUMNS) - {key for key, _ in keys}
+        if missing:
+            raise exceptions.InvalidFileError(f"missing columns: {sorted(missing)}")
+        for line in lines:
+            if line:
+                row = dict.fromkeys(HISTORY_COLUMNS)
+                row.update((key, _parse(key, line[i])) for key, i in keys)
+                yield row
+
+
+def _parse(key: str, value: str):
+    if key in ("code", "name", "market"):
+        return value
+    if not value:
+        return None
+    return Decimal(value) if key == "change_rate" else int(value)
+
+
+def _open_text(file_path: str, encoding: str) -> TextIO:
+    with open(file_path, "rb") as stock_file:
+        is_gzip = stock_file.read(2) == GZIP_MAGIC
+    opener = gzip.open if is_gzip else open
+    return opener(file_path, "rt", encoding=encoding, newline="")
+
 
+def upsert_stock(
+    stock_list: Iterable[dict],
+    db: Engine,
+    trade_date: date,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    use_copy: bool = False,
+) -> UpsertCounts:
+    """Load one trading day; one transaction for all rows.
 
-def upsert_stock(stock_list: list[models.Stock], db: Engine):
-    mapping_list = list(map(jsonable_encoder, stock_list))
+    ``stock_list`` is any iterable of fetch_stocks rows; it is consumed one
+    batch at a time. Each row becomes a ``stock_prices`` entry for
+    ``trade_date``, and moves ``Stock.price`` unless the stock already holds a
+    later close; unchanged stocks are not written at all, and the ids of the
+    ones that were end up in ``changed_ids``. The stock price epoch is bumped
+    in the same transaction when any price changed, so cached wishlist reads
+    never pair the new epoch with the old prices.
+    """
+    with db.begin() as conn:
+        return _load_trade_day(conn, stock_list, trade_date, batch_size, use_copy)
 
-    q = insert(models.Stock.__table__).values(mapping_list)
 
+def _load_trade_day(
+    conn: Connection,
+    stock_list: Iterable[dict],
+    trade_date: date,
+    batch_size: int,
+    use_copy: bool,
+) -> UpsertCounts:
+    counts = UpsertCounts()
+    insert_for = get_insert(conn.dialect.name)
+    if conn.dialect.name == "postgresql" and use_copy:
+        _copy_postgres(conn, stock_list, trade_date, batch_size, counts)
+    else:
+        snapshot = _load_snapshot(conn)
+        listed = set()
+        for batch in _batches(stock_list, batch_size):
+            listed.update(row["code"] for row in batch)
+            _upsert_changed(conn, insert_for, snapshot, batch, trade_date, counts)
+            _upsert_history(conn, insert_for, snapshot, batch, trade_date, counts)
+        counts.delisted = len(snapshot.keys() - listed)
+    if counts.changed:
+        versioning.bump_epoch(conn, versioning.STOCK_PRICES)
+    return counts
+
+
+def list_price_files(directory: str) -> list[str]:
+    return [
+        os.path.join(directory, name)
+        for name in sorted(os.listdir(directory))
+        if TRADE_DATE_PATTERN.search(name)
+    ]
+
+
+def file_checksum(file_path: str) -> str:
+    """sha256 of the raw file bytes, read in chunks ahead of any parsing."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as price_file:
+        for chunk in iter(lambda: price_file.read(CHECKSUM_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_pending_files(file_paths: Iterable[str], db: Engine) -> list[PriceFile]:
+    """The files whose checksum is not in the ledger, oldest trade date first.
+
+    Copies of one file are loaded once.
+    """
+    files = {}
+    for file_path in file_paths:
+        price_file = PriceFile(
+            file_path, file_checksum(file_path), get_trade_date(file_path)
+        )
+        files.setdefault(price_file.checksum, price_file)
+    ledger = models.StockPriceFile.__table__
     with db.connect() as conn:
+        applied = conn.execute(
+            select(ledger.c.checksum).where(ledger.c.checksum.in_(list(files)))
+        ).scalars()
+        for checksum in applied:
+            del files[checksum]
+    return sorted(files.values(), key=lambda f: (f.trade_date, f.path))
+
+
+def parse_file(
+    file_path: str,
+    encoding: str = KRX_ENCODING,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[list[dict]]:
+    """fetch_stocks in batches of ``batch_size`` rows."""
+    rows = fetch_stocks(file_path, encoding=encoding)
+    while batch := list(itertools.islice(rows, batch_size)):
+        yield batch
+
+
+def ingest(
+    file_paths: Iterable[str],
+    db: Engine,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    use_copy: bool = False,
+    encoding: str = KRX_ENCODING,
+    workers: Optional[int] = None,
+) -> Iterator[tuple[PriceFile, UpsertCounts]]:
+    """Load the files the ledger has not seen, yielding each as it commits.
+
+    Parsing runs ahead in a process pool while this process alone writes, one
+    file per transaction in trade date order, together with its ledger row.
+    An interrupted backfill therefore resumes at the first uncommitted file.
+    A single file (or ``workers=1``) is streamed in this process instead.
+    """
+    pending = find_pending_files(file_paths, db)
+    workers = workers or os.cpu_count() or 1
+    if len(pending) <= 1 or workers == 1:
+        for price_file in pending:
+            rows = fetch_stocks(price_file.path, encoding=encoding)
+            yield price_file, _apply_file(db, price_file, rows, batch_size, use_copy)
+        return
+    with tempfile.TemporaryDirectory() as spool_dir, ProcessPoolExecutor(
+        max_workers=min(workers, len(pending))
+    ) as pool:
+        parsed = _parse_ahead(
+            pool, pending, encoding, batch_size, spool_dir, window=2 * workers
+        )
+        for price_file, rows in parsed:
+            yield price_file, _apply_file(db, price_file, rows, batch_size, use_copy)
+
+
+def _apply_file(
+    db: Engine,
+    price_file: PriceFile,
+    rows: Iterable[dict],
+    batch_size: int,
+    use_copy: bool,
+) -> UpsertCounts:
+    with db.begin() as conn:
+        counts = _load_trade_day(
+            conn, rows, price_file.trade_date, batch_size, use_copy
+        )
+        _record_file(conn, price_file, counts)
+    return counts
+
+
+def _parse_ahead(
+    pool: Executor,
+    files: list[PriceFile],
+    encoding: str,
+    batch_size: int,
+    spool_dir: str,
+    window: int,
+) -> Iterator[tuple[PriceFile, Iterator[dict]]]:
+    # In order, with at most ``window`` files parsing or spooled ahead.
+    queued = collections.deque()
+    for i, price_file in enumerate(files):
+        spool_path = os.path.join(spool_dir, f"{i}.pickle")
+        queued.append(
+            (
+                price_file,
+                pool.submit(
+                    _spool_file, price_file.path, encoding, batch_size, spool_path
+                ),
+            )
+        )
+        if len(queued) >= window:
+            ready_file, spooled = queued.popleft()
+            yield ready_file, _read_spool(spooled.result())
+    for ready_file, spooled in queued:
+        yield ready_file, _read_spool(spooled.result())
+
+
+def _spool_file(file_path: str, encoding: str, batch_size: int, spool_path: str) -> str:
+    # Runs in a pool worker. Batches are pickled to disk one at a time and read
+    # back the same way, so neither process holds a whole file in memory.
+    with open(spool_path, "wb") as spool:
+        for batch in parse_file(file_path, encoding, batch_size):
+            pickle.dump(batch, spool, pickle.HIGHEST_PROTOCOL)
+    return spool_path
+
+
+def _read_spool(spool_path: str) -> Iterator[dict]:
+    try:
+        with open(spool_path, "rb") as spool:
+            while True:
+                try:
+                    batch = pickle.load(spool)
+                except EOFError:
+                    return
+                yield from batch
+    finally:
+        os.remove(spool_path)
+
+
+def _record_file(conn: Connection, price_file: PriceFile, counts: UpsertCounts):
+    conn.execute(
+        models.StockPriceFile.__table__.insert().values(
+            file_name=os.path.basename(price_file.path),
+            checksum=price_file.checksum,
+            trade_date=price_file.trade_date,
+            applied_at=datetime.utcnow(),
+            inserted=counts.inserted,
+            updated=counts.updated,
+            unchanged=counts.unchanged,
+            delisted=counts.delisted,
+        )
+    )
+
+
+def _batches(rows: Iterable[dict], batch_size: int) -> Iterator[list[dict]]:
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, batch_size)):
+        # ON CONFLICT cannot touch the same row twice in one statement.
+        yield list({row["code"]: row for row in batch}.values())
+
+
+def _stock_values(row: dict, trade_date: date) -> dict:
+    return {**{name: row[name] for name in STOCK_COLUMNS}, "price_date": trade_date}
+
+
+def _load_snapshot(conn: Connection) -> dict[str, tuple]:
+    """code -> (id, price, latest trade date) for every stock, read once per run.
+
+    The latest date is the newest of ``price_date`` and the stock's history:
+    a price that did not move keeps its ``price_date``, but files of later
+    days still make older ones stale.
+    """
+    stocks = models.Stock.__table__
+    return {
+        code: (stock_id, price, _latest(price_date, history_date))
+        for stock_id, code, price, price_date, history_date in conn.execute(
+            select(
+                stocks.c.id,
+                stocks.c.code,
+                stocks.c.price,
+                stocks.c.price_date,
+                _latest_history_date(stocks),
+            )
+        )
+    }
+
+
+def _latest_history_date(stocks):
+    stock_prices = models.StockPrice.__table__
+    return (
+        select(func.max(stock_prices.c.date))
+        .where(stock_prices.c.stock_id == stocks.c.id)
+        .scalar_subquery()
+    )
+
+
+def _latest(*dates: Optional[date]) -> Optional[date]:
+    return max((day for day in dates if day is not None), default=None)
+
+
+def _is_newer(current: Optional[tuple], price: int, trade_date: date) -> bool:
+    # Only a moved price is written; a file older than what the stock has
+    # already seen never moves it, while a same-day reload may correct it.
+    if current is None:
+        return True
+    _, current_price, latest_date = current
+    if latest_date is not None and latest_date > trade_date:
+        return False
+    return current_price != price
+
+
+def _is_newer_price(stocks, incoming):
+    # _is_newer in SQL, for rows that changed after the snapshot was read.
+    stock_prices = models.StockPrice.__table__
+    return and_(
+        stocks.c.price.is_distinct_from(incoming.price),
+        or_(
+            stocks.c.price_date.is_(None),
+            stocks.c.price_date <= incoming.price_date,
+        ),
+        # ON CONFLICT clauses do not correlate subqueries, so name the outer
+        # columns directly rather than letting stocks join in a second time.
+        ~exists().where(
+            stock_prices.c.stock_id == literal_column(f"{stocks.name}.id"),
+            stock_prices.c.date > literal_column("excluded.price_date"),
+        ),
+    )
+
+
+def _upsert_changed(
+    conn: Connection,
+    insert_for: Callable,
+    snapshot: dict[str, tuple],
+    batch: list[dict],
+    trade_date: date,
+    counts: UpsertCounts,
+):
+    """Write only the new and changed stocks of ``batch``, keeping ``snapshot``
+    in step so codes repeated in later batches compare against this write.
+    """
+    stocks = models.Stock.__table__
+    changed = [
+        row
+        for row in batch
+        if _is_newer(snapshot.get(row["code"]), row["price"], trade_date)
+    ]
+    new_codes = [row["code"] for row in changed if row["code"] not in snapshot]
+    if changed:
+        insert = insert_for(stocks)
         conn.execute(
-            q.on_conflict_do_update(
-                index_elements=["code"],
+            insert.on_conflict_do_update(
+                index_elements=[stocks.c.code],
                 set_={
-                    "price": q.excluded.price,
+                    "price": insert.excluded.price,
+                    "price_date": insert.excluded.price_date,
                 },
-            )
+                where=_is_newer_price(stocks, insert.excluded),
+            ),
+            [_stock_values(row, trade_date) for row in changed],
         )
+    new_ids = {}
+    if new_codes:
+        new_ids = dict(
+            conn.execute(
+                select(stocks.c.code, stocks.c.id).where(stocks.c.code.in_(new_codes))
+            ).all()
+        )
+    for row in changed:
+        code = row["code"]
+        stock_id = new_ids[code] if code in new_ids else snapshot[code][0]
+        snapshot[code] = (stock_id, row["price"], trade_date)
+        counts.changed_ids.add(stock_id)
+    for row in batch:
+        # The history written next makes this day the stock's latest too.
+        stock_id, price, latest_date = snapshot[row["code"]]
+        snapshot[row["code"]] = (stock_id, price, _latest(latest_date, trade_date))
+    counts.add(len(batch), len(new_codes), len(changed) - len(new_codes))
+
+
+def _upsert_history(
+    conn: Connection,
+    insert_for: Callable,
+    snapshot: dict[str, tuple],
+    batch: list[dict],
+    trade_date: date,
+    counts: UpsertCounts,
+):
+    history = [
+        {
+            "stock_id": snapshot[row["code"]][0],
+            "date": trade_date,
+            "close": row["price"],
+            **{name: row[name] for name in HISTORY_COLUMNS},
+        }
+        for row in batch
+    ]
+    # executemany: the driver batches it (execute_values on psycopg2) instead
+    # of SQLAlchemy compiling a fresh multi-row VALUES statement per batch.
+    insert = insert_for(models.StockPrice.__table__)
+    conn.execute(
+        insert.on_conflict_do_update(
+            index_elements=["stock_id", "date"],
+            set_={name: insert.excluded[name] for name in ("close", *HISTORY_COLUMNS)},
+        ),
+        history,
+    )
+    counts.history += len(history)
+
+
+IMPORT_COLUMNS = {
+    "code": "varchar",
+    "name": "varchar",
+    "market": "varchar",
+    "price": "bigint",
+    **{name: "bigint" for name in HISTORY_COLUMNS},
+    "change_rate": "numeric",
+}
+
+
+def _copy_postgres(
+    conn: Connection,
+    rows: Iterable[dict],
+    trade_date: date,
+    batch_size: int,
+    counts: UpsertCounts,
+):
+    columns = ", ".join(IMPORT_COLUMNS)
+    conn.execute(
+        text(
+            "CREATE TEMPORARY TABLE stock_import ("
+            + ", ".join(f"{name} {type_}" for name, type_ in IMPORT_COLUMNS.items())
+            + ") ON COMMIT DROP"
+        )
+    )
+    cursor = conn.connection.cursor()
+    for batch in _batches(rows, batch_size):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            [row[name] for name in IMPORT_COLUMNS] for row in batch
+        )
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY stock_import ({columns}) FROM STDIN WITH CSV", buffer)
+    cursor.close()
+    # Across batches a code may repeat; the last line wins, as in _batches.
+    conn.execute(
+        text(
+            "DELETE FROM stock_import a USING stock_import b "
+            "WHERE a.code = b.code AND a.ctid < b.ctid"
+        )
+    )
+
+    # Unchanged rows fail the WHERE, so they are neither rewritten nor returned.
+    written = dict(
+        conn.execute(
+            text(
+                "INSERT INTO stocks (code, name, market, price, price_date) "
+                "SELECT code, name, market, price, :trade_date FROM stock_import "
+                "ON CONFLICT (code) DO UPDATE "
+                "SET price = excluded.price, price_date = excluded.price_date "
+                "WHERE stocks.price IS DISTINCT FROM excluded.price "
+                "AND (stocks.price_date IS NULL "
+                "OR stocks.price_date <= excluded.price_date) "
+                "AND NOT EXISTS (SELECT 1 FROM stock_prices "
+                "WHERE stock_prices.stock_id = stocks.id "
+                "AND stock_prices.date > excluded.price_date) "
+                "RETURNING id, xmax = 0"
+            ),
+            {"trade_date": trade_date},
+        ).all()
+    )
+    inserted = sum(written.values())
+    total = conn.execute(text("SELECT count(*) FROM stock_import")).scalar()
+    counts.add(total, inserted, len(written) - inserted)
+    counts.changed_ids.update(written)
+    counts.delisted = conn.execute(
+        text(
+            "SELECT count(*) FROM stocks WHERE NOT EXISTS "
+            "(SELECT 1 FROM stock_import WHERE stock_import.code = stocks.code)"
+        )
+    ).scalar()
+
+    history_columns = ", ".join(HISTORY_COLUMNS)
+    counts.history += conn.execute(
+        text(
+            f"INSERT INTO stock_prices (stock_id, date, close, {history_columns}) "
+            f"SELECT stocks.id, :trade_date, stock_import.price, {history_columns} "
+            "FROM stock_import JOIN stocks USING (code) "
+            "ON CONFLICT (stock_id, date) DO UPDATE SET "
+            + ", ".join(
+                f"{name} = excluded.{name}" for name in ("close", *HISTORY_COLUMNS)
+            )
+        ),
+        {"trade_date": trade_date},
+    ).rowcount
 
 
 if __name__ == "__main__":